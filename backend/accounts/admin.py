@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import User, UserProfile
+from .models import User, UserImport, UserProfile
 
 
 class UserProfileInline(admin.StackedInline):
@@ -35,4 +35,15 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
-admin.site.register(User, UserAdmin) 
\ No newline at end of file
+admin.site.register(User, UserAdmin) 
+
+
+@admin.register(UserImport)
+class UserImportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant', 'requested_by', 'status', 'created_count', 'created_at', 'completed_at')
+    list_filter = ('status',)
+    search_fields = ('tenant__name',)
+    readonly_fields = (
+        'tenant', 'requested_by', 'file', 'default_role', 'status', 'created_count',
+        'skipped', 'errors', 'started_at', 'completed_at'
+    )
@@ -0,0 +1,81 @@
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from tenants.sharding import activate_tenant
+from .user_cache import get_cached_user
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    User built from access token claims.
+    
+    Identity, tenant and role come from the claims, so permission changes
+    apply from the next token refresh; any other attribute is read from the
+    cached user. Like Django's lazy ``request.user`` it passes for a
+    ``User`` in relations and comparisons.
+    """
+    
+    def __init__(self, token, user=None):
+        user_id = token[api_settings.USER_ID_CLAIM]
+        tenant_id = token['tenant_id']
+        super().__init__(lambda: get_cached_user(user_id, tenant_id))
+        if user is not None:
+            self._wrapped = user
+        self.__dict__['_claims'] = {
+            'id': user_id,
+            'tenant_id': tenant_id,
+            'role': token.get('role'),
+            'is_tenant_admin': token.get('is_tenant_admin', False),
+        }
+    
+    id = pk = property(lambda self: self._claims['id'])
+    tenant_id = property(lambda self: self._claims['tenant_id'])
+    role = property(lambda self: self._claims['role'])
+    is_tenant_admin = property(lambda self: self._claims['is_tenant_admin'])
+    is_authenticated = True
+    is_anonymous = False
+    
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+    
+    @property
+    def is_tenant_administrator(self):
+        return self.role == 'tenant_admin' or self.is_tenant_admin
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that routes the rest of the request to the shard (and
+    schema) of the authenticated user's tenant.
+    
+    Tokens carrying tenant claims are served from the user cache without
+    queries; older tokens fall back to loading the user.
+    """
+    
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None and result[0].tenant_id:
+            # Reset together with the request by TenantDatabaseMiddleware
+            activate_tenant(result[0].tenant_id)
+        return result
+    
+    def get_user(self, validated_token):
+        if 'tenant_id' not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        
+        # Saving or deleting a user drops its cache entry, so deactivation
+        # still takes effect immediately
+        user = get_cached_user(user_id, validated_token['tenant_id'])
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return ClaimsUser(validated_token, user)
@@ -0,0 +1,118 @@
+"""
+Avatar uploads and thumbnails.
+
+Uploads are read in chunks (Django spools large ones to a temporary file),
+checked to be an image from their header alone, no larger than
+``AVATAR_MAX_PIXELS`` once decoded, and stored under the SHA-256 of their
+content, so identical uploads share one file. Thumbnails
+of ``AVATAR_THUMBNAIL_SIZES`` are rendered in the background by
+``generate_avatar_thumbnails`` as square WebP images, also named after the
+original's digest, and recorded in ``User.avatar_thumbnails``.
+
+Shared files are not deleted when a user replaces or removes an avatar;
+``manage.py cleanup_avatars`` deletes the originals and thumbnails no user
+refers to any more.
+"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+AVATAR_DIR = 'avatars'
+
+AVATAR_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+class InvalidAvatar(ValueError):
+    pass
+
+
+def thumbnail_sizes():
+    return getattr(settings, 'AVATAR_THUMBNAIL_SIZES', (64, 128, 256))
+
+
+def content_digest(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def avatar_name(digest, extension):
+    # Two-level fan-out keeps directories small
+    return f'{AVATAR_DIR}/{digest[:2]}/{digest}.{extension}'
+
+
+def thumbnail_name(digest, size):
+    return f'{AVATAR_DIR}/{digest[:2]}/{digest}-{size}.webp'
+
+
+def max_pixels():
+    return getattr(settings, 'AVATAR_MAX_PIXELS', 25_000_000)
+
+
+def store_avatar(upload):
+    """
+    Validate ``upload`` and store it under its content digest. Returns the
+    storage name; an identical file already stored is reused.
+    """
+    max_size = getattr(settings, 'AVATAR_MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+    if upload.size > max_size:
+        raise InvalidAvatar(f'Avatars may be at most {max_size // (1024 * 1024)} MB.')
+    try:
+        # verify() reads the header and structure without decoding pixels
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidAvatar('Upload a valid image.')
+    # A small file may declare huge dimensions, and thumbnails decode it all
+    if width * height > max_pixels():
+        raise InvalidAvatar(f'Avatars may be at most {max_pixels():,} pixels.')
+    if image_format not in AVATAR_FORMATS:
+        raise InvalidAvatar(f"Avatars must be {', '.join(AVATAR_FORMATS)} images.")
+    upload.seek(0)
+
+    name = avatar_name(content_digest(upload), AVATAR_FORMATS[image_format])
+    if not default_storage.exists(name):
+        # Storage writes the upload chunk by chunk
+        name = default_storage.save(name, upload)
+    return name
+
+
+def render_thumbnails(name):
+    """
+    Render and store the thumbnails of the stored avatar ``name``. Returns
+    ``{size: storage name}``, reusing thumbnails that already exist.
+    """
+    digest = os.path.splitext(os.path.basename(name))[0]
+    thumbnails = {size: thumbnail_name(digest, size) for size in thumbnail_sizes()}
+    missing = {size: path for size, path in thumbnails.items() if not default_storage.exists(path)}
+    if missing:
+        with default_storage.open(name, 'rb') as original, Image.open(original) as image:
+            # Decode a reduced image straight away for JPEGs
+            image.draft('RGB', (max(missing) * 2, max(missing) * 2))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for size, path in sorted(missing.items(), reverse=True):
+                thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                buffer = io.BytesIO()
+                thumbnail.save(buffer, 'WEBP', quality=80, method=4)
+                thumbnails[size] = default_storage.save(path, ContentFile(buffer.getvalue()))
+    return {str(size): path for size, path in thumbnails.items()}
+
+
+def thumbnail_urls(user, request=None):
+    """Absolute URLs of ``user``'s avatar thumbnails, keyed by size."""
+    urls = {}
+    for size, path in (user.avatar_thumbnails or {}).items():
+        url = default_storage.url(path)
+        urls[size] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,146 @@
+"""
+Refresh token blacklist checks that rarely touch the database.
+
+Each process keeps a bloom filter over the JTIs in ``BlacklistedToken``,
+which stays the source of truth. The filter is topped up incrementally from
+rows newer than the highest id it has seen, at most every
+``TOKEN_BLACKLIST_SYNC_INTERVAL`` seconds, and rebuilt from scratch when the
+expired-token cleanup bumps the shared generation number. A rebuilt filter
+is sized for twice the rows it starts with (and at least
+``TOKEN_BLACKLIST_BLOOM_CAPACITY``), so it is only rebuilt early once it has
+doubled. Ids are not committed in order, so every top-up re-reads the last
+``TOKEN_BLACKLIST_SYNC_OVERLAP`` ids below the highest one seen; a row
+committed later than that is still caught by the shared cache entry written
+when it was blacklisted.
+
+A JTI the filter has never seen is only looked up in the shared cache,
+which covers tokens blacklisted by other processes since the last sync.
+Possible members are confirmed against the database, so false positives
+cost a query but never reject a valid token.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+GENERATION_KEY = 'accounts:token_blacklist:generation'
+
+
+def recent_blacklist_key(jti):
+    return f'accounts:token_blacklist:jti:{jti}'
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(value))
+
+
+class BlacklistStore:
+    """Per-process view of the refresh token blacklist."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._high_water_mark = 0
+        self._generation = None
+        self._synced_at = 0.0
+
+    def _capacity(self):
+        return getattr(settings, 'TOKEN_BLACKLIST_BLOOM_CAPACITY', 100000)
+
+    def _new_filter(self):
+        # Sized from the table, so a large blacklist isn't reloaded on every sync
+        return BloomFilter(
+            max(self._capacity(), 2 * BlacklistedToken.objects.count()),
+            getattr(settings, 'TOKEN_BLACKLIST_BLOOM_ERROR_RATE', 0.001),
+        )
+
+    def _load(self, since=0):
+        return (
+            BlacklistedToken.objects.filter(pk__gt=since)
+            .order_by('pk')
+            .values_list('pk', 'token__jti')
+            .iterator()
+        )
+
+    def sync(self, force=False):
+        """Add newly blacklisted JTIs, or rebuild when the generation changed."""
+        interval = getattr(settings, 'TOKEN_BLACKLIST_SYNC_INTERVAL', 5)
+        # Without a filter yet there is nothing to fall back on, however
+        # soon after start (monotonic time may begin near 0)
+        if not force and self._filter is not None and time.monotonic() - self._synced_at < interval:
+            return
+        with self._lock:
+            generation = cache.get(GENERATION_KEY, 0)
+            rebuild = (
+                self._filter is None
+                or generation != self._generation
+                # Past capacity the false positive rate climbs
+                or self._filter.count > self._filter.capacity
+            )
+            bloom = self._new_filter() if rebuild else self._filter
+            high_water_mark = 0 if rebuild else self._high_water_mark
+            overlap = 0 if rebuild else getattr(settings, 'TOKEN_BLACKLIST_SYNC_OVERLAP', 1000)
+            for pk, jti in self._load(since=max(0, high_water_mark - overlap)):
+                # Rows in the overlap are mostly in the filter already
+                if jti not in bloom:
+                    bloom.add(jti)
+                high_water_mark = max(high_water_mark, pk)
+            self._filter = bloom
+            self._high_water_mark = high_water_mark
+            self._generation = generation
+            self._synced_at = time.monotonic()
+
+    def add(self, jti, expires_at=None):
+        """Record a JTI blacklisted by this process and share it until it expires."""
+        if self._filter is not None:
+            with self._lock:
+                self._filter.add(jti)
+        timeout = None
+        if expires_at is not None:
+            timeout = max(1, int((expires_at - timezone.now()).total_seconds()))
+        cache.set(recent_blacklist_key(jti), True, timeout)
+
+    def contains(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return bool(cache.get(recent_blacklist_key(jti)))
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def invalidate(self):
+        """Make every process rebuild its filter on its next sync."""
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, 1, None)
+
+
+blacklist_store = BlacklistStore()
@@ -0,0 +1,274 @@
+"""
+Bulk user import from CSV.
+
+The file is read row by row and validated as a whole before anything is
+written: emails are checked against the login directory with one query per
+batch, and the import is refused if it would take the tenant past its
+plan's ``max_users``. Users and profiles are then inserted with
+``bulk_create`` on the tenant's shard (plus directory copies on the default
+database) and the tenant's ``user_count`` is bumped once on each copy of
+the tenant.
+
+Hashing initial passwords is CPU-bound and dominates the import, far longer
+than a request may take, so files uploaded through the API are stored as a
+``UserImport`` and imported by the ``import_user_file`` task; clients poll
+the import for its outcome. Only the ``import_users`` command hashes in a
+process pool, one process per CPU; Celery workers can't start child
+processes and hash in their own.
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from tenants.models import Tenant
+from tenants.resolver import invalidate_tenant
+from tenants.sharding import is_sharded, shard_for_tenant
+from .models import User, UserImport, UserProfile
+
+
+IMPORT_COLUMNS = ('email', 'first_name', 'last_name', 'role', 'phone_number', 'password')
+
+IMPORT_ROLES = ('user', 'tenant_admin')
+
+
+class UserImportError(Exception):
+    """The import was refused; ``errors`` lists what is wrong with it."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _batch_size():
+    return getattr(settings, 'USER_IMPORT_BATCH_SIZE', 500)
+
+
+def read_csv(file):
+    """Yield ``(line number, row dict)`` from a binary or text CSV file."""
+    if not isinstance(file, io.TextIOBase):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(file)
+    if not reader.fieldnames or 'email' not in reader.fieldnames:
+        raise UserImportError([{'line': 1, 'error': 'The header must include an email column.'}])
+    for row in reader:
+        yield reader.line_num, {
+            column: (row.get(column) or '').strip() for column in IMPORT_COLUMNS
+        }
+
+
+def parse_rows(rows, default_role='user'):
+    """
+    Validate CSV rows. Returns the valid rows, de-duplicated by email, and
+    the errors as ``{'line', 'email', 'error'}`` dicts.
+    """
+    max_rows = getattr(settings, 'USER_IMPORT_MAX_ROWS', 10000)
+    valid = {}
+    errors = []
+    for line, row in rows:
+        if len(valid) + len(errors) >= max_rows:
+            errors.append({'line': line, 'error': f'Imports are limited to {max_rows} rows.'})
+            break
+        email = User.objects.normalize_email(row['email'])
+        row.update(email=email, role=row['role'] or default_role)
+        try:
+            validate_email(email)
+            if row['role'] not in IMPORT_ROLES:
+                raise ValidationError(f"Role must be one of: {', '.join(IMPORT_ROLES)}.")
+            if email in valid:
+                raise ValidationError('Duplicate email in the file.')
+            if row['password']:
+                validate_password(row['password'])
+        except ValidationError as e:
+            errors.append({'line': line, 'email': email, 'error': ' '.join(e.messages)})
+            continue
+        valid[email] = row
+    return list(valid.values()), errors
+
+
+def existing_emails(emails):
+    """Emails that already have an account, looked up in the login directory."""
+    existing = set()
+    for batch in _batches(emails, _batch_size()):
+        existing.update(
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(email__in=batch)
+            .values_list('email', flat=True)
+        )
+    return existing
+
+
+def _init_hash_worker(settings_module):
+    # Spawned workers start without Django; forked ones inherit it
+    if not django_apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+        django.setup()
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Hash ``passwords`` in order, spreading them over a pool of ``workers``
+    processes when there is more than one. Empty passwords become unusable.
+    """
+    to_hash = [password for password in passwords if password]
+    if workers > 1 and len(to_hash) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(to_hash)),
+            initializer=_init_hash_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),),
+        ) as pool:
+            hashed = list(pool.map(make_password, to_hash,
+                                   chunksize=max(1, len(to_hash) // (workers * 4))))
+    else:
+        hashed = list(map(make_password, to_hash))
+    hashed = iter(hashed)
+    return [next(hashed) if password else make_password(None) for password in passwords]
+
+
+def plan_user_limit(tenant):
+    """The tenant's ``max_users``, or ``None`` without an active plan or limit."""
+    subscription = tenant.active_subscription
+    if subscription is None or not subscription.plan.max_users:
+        return None
+    return subscription.plan.max_users
+
+
+def check_seats(tenant_id, adding, lock=False):
+    """Raise ``UserImportError`` unless the tenant's plan has room for ``adding`` users."""
+    tenants = Tenant.objects.select_for_update() if lock else Tenant.objects.all()
+    user_count = tenants.values_list('user_count', flat=True).get(pk=tenant_id)
+    # The active subscription pointer lives on the tenant's shard
+    limit = plan_user_limit(
+        Tenant.objects.using(shard_for_tenant(tenant_id)).with_active_plan().get(pk=tenant_id)
+    )
+    if limit is not None and user_count + adding > limit:
+        raise UserImportError([{
+            'error': f'The plan allows {limit} users; the tenant has '
+                     f'{user_count} and the file adds {adding}.'
+        }])
+
+
+def import_users(tenant, rows, default_role='user', hash_workers=1):
+    """
+    Create the users in ``rows`` (``(line, row dict)`` pairs, see
+    ``read_csv``) in ``tenant``. Raises ``UserImportError`` when a row is
+    invalid or the plan has no room for them; otherwise nothing is written.
+    Passwords are hashed by ``hash_workers`` processes.
+
+    Returns ``(created, skipped)``: the number of users created and the
+    emails skipped because they already have an account.
+    """
+    rows, errors = parse_rows(rows, default_role)
+    if errors:
+        raise UserImportError(errors)
+
+    existing = existing_emails([row['email'] for row in rows])
+    rows = [row for row in rows if row['email'] not in existing]
+    skipped = sorted(existing)
+    if not rows:
+        return 0, skipped
+
+    # Fail before hashing, then check again under the lock
+    check_seats(tenant.pk, len(rows))
+    passwords = hash_passwords([row['password'] for row in rows], workers=hash_workers)
+
+    alias = shard_for_tenant(tenant.pk)
+    batch_size = _batch_size()
+    with transaction.atomic(using=DEFAULT_DB_ALIAS), transaction.atomic(using=alias):
+        # Locking the tenant row serializes concurrent imports
+        check_seats(tenant.pk, len(rows), lock=True)
+
+        for batch in _batches(list(zip(rows, passwords)), batch_size):
+            users = User.objects.using(alias).bulk_create([
+                User(
+                    email=row['email'],
+                    username=row['email'],
+                    first_name=row['first_name'],
+                    last_name=row['last_name'],
+                    phone_number=row['phone_number'] or None,
+                    role=row['role'],
+                    is_tenant_admin=row['role'] == 'tenant_admin',
+                    tenant_id=tenant.pk,
+                    password=password,
+                )
+                for row, password in batch
+            ])
+            # bulk_create skips the signals that keep the directory copies
+            if is_sharded() and alias != DEFAULT_DB_ALIAS:
+                fields = [field.attname for field in User._meta.concrete_fields]
+                User.objects.using(DEFAULT_DB_ALIAS).bulk_create([
+                    User(**{field: getattr(user, field) for field in fields})
+                    for user in users
+                ])
+            UserProfile.objects.using(alias).bulk_create(
+                [UserProfile(user=user) for user in users]
+            )
+
+        # Like the user receivers, adjust the counter on every copy of the tenant
+        for tenant_alias in dict.fromkeys([DEFAULT_DB_ALIAS, alias]):
+            Tenant.objects.using(tenant_alias).filter(pk=tenant.pk).update(
+                user_count=F('user_count') + len(rows)
+            )
+        transaction.on_commit(lambda: invalidate_tenant(tenant), using=DEFAULT_DB_ALIAS)
+
+    return len(rows), skipped
+
+
+def start_import(tenant, file, default_role='user', requested_by=None):
+    """Store an uploaded CSV file and queue its import. Returns the ``UserImport``."""
+    from .tasks import import_user_file
+
+    user_import = UserImport.objects.create(
+        tenant=tenant, file=file, default_role=default_role, requested_by=requested_by
+    )
+    transaction.on_commit(lambda: import_user_file.delay(user_import.pk))
+    return user_import
+
+
+def run_import(user_import):
+    """Import the stored file of ``user_import`` and record the outcome."""
+    user_import.status = 'running'
+    user_import.started_at = timezone.now()
+    user_import.save(update_fields=['status', 'started_at', 'updated_at'])
+    try:
+        with user_import.file.open('rb') as file:
+            created, skipped = import_users(
+                user_import.tenant, read_csv(file), default_role=user_import.default_role
+            )
+    except UserImportError as e:
+        user_import.status = 'failed'
+        user_import.errors = e.errors
+    except UnicodeDecodeError:
+        user_import.status = 'failed'
+        user_import.errors = [{'error': 'The file must be UTF-8 encoded CSV'}]
+    except Exception as exc:
+        # Nothing was written, so the file is kept for another run
+        user_import.status = 'failed'
+        user_import.errors = [{'error': repr(exc)}]
+        user_import.save(update_fields=['status', 'errors', 'updated_at'])
+        raise
+    else:
+        user_import.status = 'completed'
+        user_import.created_count = created
+        user_import.skipped = skipped
+    user_import.completed_at = timezone.now()
+    # The outcome is recorded, so the upload is no longer needed
+    user_import.file.delete(save=False)
+    user_import.save()
+    return user_import
@@ -0,0 +1,112 @@
+"""
+Write-behind ``last_login`` updates.
+
+Issuing a token used to save ``last_login`` straight away: one UPDATE (and
+the replication and cache receivers of a full save) per login, all on the
+hottest rows of ``auth_user``. Logins now record the time in a per-process
+buffer instead, and the buffer is written with one bulk UPDATE per
+database when its oldest entry is ``LAST_LOGIN_MAX_STALENESS`` seconds old,
+when it holds ``LAST_LOGIN_FLUSH_SIZE`` users, from a timer when the
+process goes quiet, and at interpreter exit. A value can therefore lag by
+up to the staleness bound, and a crashing process loses what it buffered.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from tenants.sharding import is_sharded, shard_for_tenant
+from .models import User
+from .user_cache import invalidate_cached_users
+
+
+logger = logging.getLogger(__name__)
+
+
+def _max_staleness():
+    return getattr(settings, 'LAST_LOGIN_MAX_STALENESS', 60)
+
+
+class LastLoginBuffer:
+    """Per-process buffer of ``last_login`` values waiting to be written."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._oldest = None
+        self._timer = None
+
+    def record(self, user, when=None):
+        """Set ``user.last_login`` and queue it for the next flush."""
+        user.last_login = when or timezone.now()
+        if _max_staleness() <= 0:
+            self._write({user.pk: (user.tenant_id, user.last_login)})
+            return
+        with self._lock:
+            self._pending[user.pk] = (user.tenant_id, user.last_login)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = (
+                time.monotonic() - self._oldest >= _max_staleness()
+                or len(self._pending) >= getattr(settings, 'LAST_LOGIN_FLUSH_SIZE', 500)
+            )
+            if not due and self._timer is None:
+                self._start_timer()
+        if due:
+            self.flush()
+
+    def _start_timer(self):
+        # Flushes buffers that stop filling up before they become due
+        self._timer = threading.Timer(_max_staleness(), self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # Connections opened by this thread would otherwise leak
+            connections.close_all()
+
+    def flush(self):
+        """Write every buffered value. Returns the number of users written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._oldest = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if pending:
+            self._write(pending)
+        return len(pending)
+
+    def _write(self, pending):
+        by_alias = {}
+        for user_id, (tenant_id, last_login) in pending.items():
+            aliases = [shard_for_tenant(tenant_id)]
+            if is_sharded():
+                # The directory copy on the default database too
+                aliases.append(DEFAULT_DB_ALIAS)
+            for alias in dict.fromkeys(aliases):
+                by_alias.setdefault(alias, []).append(User(pk=user_id, last_login=last_login))
+        for alias, users in by_alias.items():
+            try:
+                User.objects.using(alias).bulk_update(
+                    users, ['last_login'],
+                    batch_size=getattr(settings, 'LAST_LOGIN_FLUSH_SIZE', 500)
+                )
+            except Exception:
+                logger.exception('Could not write last_login of %d users to %s', len(users), alias)
+        # bulk_update skips the receivers that drop cached users
+        invalidate_cached_users(pending)
+
+
+last_login_buffer = LastLoginBuffer()
+
+# Graceful worker shutdown (SIGTERM handled by gunicorn, celery, runserver)
+# runs atexit handlers
+atexit.register(last_login_buffer.flush)
@@ -0,0 +1,78 @@
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from accounts.serializers import UserSerializer
+from accounts.views import CustomTokenObtainPairView
+from tenants.models import Tenant
+from tenants.serializers import TenantSerializer
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class LegacyTokenObtainPairView(TokenObtainPairView):
+    """The login flow CustomTokenObtainPairView used to run: it hashed twice."""
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == 200:
+            user = authenticate(
+                request,
+                username=request.data.get('email'),
+                password=request.data.get('password')
+            )
+            if user:
+                response.data['user'] = UserSerializer(user).data
+                if user.tenant:
+                    response.data['tenant'] = TenantSerializer(user.tenant).data
+        return response
+
+
+class Command(BaseCommand):
+    help = 'Compares latency and queries of the legacy and current login flows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10,
+                            help='Logins per flow (each hashes a password).')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['iterations'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, iterations):
+        tenant = Tenant.objects.create(name='Benchmark Login Tenant', slug='bench-login')
+        email, password = 'bench-login@example.com', 'bench-login-password'
+        User.objects.create_user(email=email, password=password, tenant=tenant)
+        request = lambda: APIRequestFactory().post(
+            '/api/auth/login/', {'email': email, 'password': password}, format='json'
+        )
+
+        self.stdout.write(f"{'flow':<8} {'queries':>8} {'mean ms':>10} {'logins/s':>10}")
+        for name, view in [
+            ('legacy', LegacyTokenObtainPairView.as_view()),
+            ('current', CustomTokenObtainPairView.as_view()),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request())
+            assert response.status_code == 200, response.data
+            started = time.perf_counter()
+            for _ in range(iterations):
+                view(request())
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name:<8} {len(queries):>8} {elapsed / iterations * 1000:>10.1f} '
+                f'{iterations / elapsed:>10.2f}'
+            )
@@ -0,0 +1,155 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import generics, permissions
+from rest_framework.test import APIRequestFactory
+
+from accounts.permissions import IsTenantMember
+from accounts.tokens import TenantRefreshToken
+from accounts.views import UserDetailView
+from subscriptions.models import Plan, Subscription
+from subscriptions.serializers import SubscriptionSerializer
+from subscriptions.views import SubscriptionDetailView
+from tenants.models import Tenant
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class LegacyIsTenantAdminOrReadOnly(permissions.BasePermission):
+    """The object check IsTenantAdminOrReadOnly used to run: it compared tenants."""
+
+    def has_permission(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return request.user.is_authenticated
+        return request.user.is_admin or request.user.is_tenant_administrator
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return request.user.is_authenticated
+        if request.user.is_admin:
+            return True
+        if request.user.is_tenant_administrator:
+            if hasattr(obj, 'tenant'):
+                return obj.tenant == request.user.tenant
+            elif hasattr(obj, 'user') and hasattr(obj.user, 'tenant'):
+                return obj.user.tenant == request.user.tenant
+        return False
+
+
+class LegacyIsTenantMember(permissions.BasePermission):
+    """The object check IsTenantMember used to run."""
+
+    def has_object_permission(self, request, view, obj):
+        if request.user.is_admin:
+            return True
+        if hasattr(obj, 'tenant'):
+            return obj.tenant == request.user.tenant
+        elif hasattr(obj, 'user') and hasattr(obj.user, 'tenant'):
+            return obj.user.tenant == request.user.tenant
+        return False
+
+
+class LegacySubscriptionDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = SubscriptionSerializer
+    permission_classes = [permissions.IsAuthenticated, LegacyIsTenantAdminOrReadOnly]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_admin:
+            subscriptions = Subscription.objects.all()
+        elif user.tenant:
+            subscriptions = Subscription.objects.filter(tenant=user.tenant)
+        else:
+            return Subscription.objects.none()
+        return subscriptions.select_related('plan', 'tenant')
+
+
+class Command(BaseCommand):
+    help = 'Compares queries and latency of the legacy and current permission checks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Requests per endpoint and flow.')
+        parser.add_argument('--objects', type=int, default=500,
+                            help='Objects checked one by one in the object check benchmark.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['iterations'], options['objects'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, iterations, objects):
+        now = timezone.now()
+        tenant = Tenant.objects.create(name='Benchmark Permissions Tenant', slug='bench-permissions')
+        plan = Plan.objects.create(name='Benchmark Permissions Plan', price=10)
+        subscriptions = Subscription.objects.bulk_create([
+            Subscription(tenant=tenant, plan=plan, status='cancelled',
+                         current_period_start=now, current_period_end=now + timedelta(days=30))
+            for _ in range(objects)
+        ])
+        admin = User.objects.create_user(
+            email='bench-permissions@example.com', password='bench-permissions-password',
+            tenant=tenant, role='tenant_admin'
+        )
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {TenantRefreshToken.for_user(admin).access_token}'}
+        factory = APIRequestFactory()
+        subscription = subscriptions[0]
+
+        endpoints = [
+            ('GET subscription', 'get', f'/api/subscriptions/{subscription.pk}/', subscription.pk,
+             LegacySubscriptionDetailView, SubscriptionDetailView),
+            ('PATCH subscription', 'patch', f'/api/subscriptions/{subscription.pk}/', subscription.pk,
+             LegacySubscriptionDetailView, SubscriptionDetailView),
+            ('GET user', 'get', f'/api/users/{admin.pk}/', admin.pk,
+             UserDetailView, UserDetailView),
+        ]
+        self.stdout.write(f"{'endpoint':<20} {'flow':<8} {'queries':>8} {'mean ms':>10}")
+        for name, method, path, pk, legacy, current in endpoints:
+            for flow, view_class in [('legacy', legacy), ('current', current)]:
+                view = view_class.as_view()
+                request = lambda: getattr(factory, method)(
+                    path, {'metadata': {}} if method == 'patch' else None, format='json', **auth
+                )
+                # Warm the user cache so only the view's own queries count
+                view(request(), pk=pk)
+                with CaptureQueriesContext(connection) as queries:
+                    response = view(request(), pk=pk)
+                assert response.status_code == 200, response.data
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    view(request(), pk=pk)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name:<20} {flow:<8} {len(queries):>8} {elapsed / iterations * 1000:>10.2f}'
+                )
+
+        # Object checks on rows loaded without their tenant, by a user loaded
+        # from the database, as in function views and token-less requests
+        self.stdout.write(f"\n{'object checks':<20} {'flow':<8} {'queries':>8} {'total ms':>10}")
+        for flow, permission in [
+            ('legacy', LegacyIsTenantMember()),
+            ('current', IsTenantMember()),
+        ]:
+            request = factory.get('/')
+            request.user = User.objects.get(pk=admin.pk)
+            rows = list(Subscription.objects.filter(tenant=tenant))
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                allowed = all(permission.has_object_permission(request, None, row) for row in rows)
+                elapsed = time.perf_counter() - started
+            assert allowed
+            self.stdout.write(
+                f'{f"{len(rows)} subscriptions":<20} {flow:<8} {len(queries):>8} {elapsed * 1000:>10.2f}'
+            )
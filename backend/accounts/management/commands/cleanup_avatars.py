@@ -0,0 +1,48 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from accounts.avatars import AVATAR_DIR
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Deletes stored avatars and thumbnails that no user refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=24,
+                            help='Only delete files older than this many hours, so uploads '
+                                 'not yet saved on their user are kept (default: 24).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the files that would be deleted.')
+
+    def handle(self, *args, **options):
+        # The default database has every user; files are named after the
+        # original's digest, thumbnails with a -<size> suffix
+        referenced = {
+            os.path.splitext(os.path.basename(name))[0]
+            for name in User.objects.using(DEFAULT_DB_ALIAS)
+            .exclude(avatar='').exclude(avatar=None)
+            .values_list('avatar', flat=True).iterator()
+        }
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+        deleted = 0
+        directories, _ = default_storage.listdir(AVATAR_DIR) if default_storage.exists(AVATAR_DIR) else ([], [])
+        for directory in directories:
+            _, files = default_storage.listdir(f'{AVATAR_DIR}/{directory}')
+            for file in files:
+                digest = os.path.splitext(file)[0].split('-', 1)[0]
+                path = f'{AVATAR_DIR}/{directory}/{file}'
+                if digest in referenced or default_storage.get_modified_time(path) > cutoff:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(path)
+                else:
+                    default_storage.delete(path)
+                deleted += 1
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {deleted} unreferenced avatar file(s).'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from accounts.models import User
+from accounts.tasks import generate_avatar_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Queues thumbnail rendering for avatars that have no thumbnails yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-render every avatar, e.g. after changing AVATAR_THUMBNAIL_SIZES.')
+
+    def handle(self, *args, **options):
+        # The default database has every user
+        users = User.objects.using(DEFAULT_DB_ALIAS).exclude(avatar='').exclude(avatar=None)
+        if not options['all']:
+            users = users.filter(avatar_thumbnails={})
+        queued = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            generate_avatar_thumbnails.delay(user_id)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued thumbnails for {queued} avatar(s).'))
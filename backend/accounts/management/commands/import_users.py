@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.imports import IMPORT_ROLES, UserImportError, import_users, read_csv
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Creates the users listed in a CSV file in a tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Tenant id or slug.')
+        parser.add_argument('file', help='CSV with an email column and optional first_name, '
+                                         'last_name, role, phone_number and password columns.')
+        parser.add_argument('--role', choices=IMPORT_ROLES, default='user',
+                            help='Role for rows that leave the role column empty.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes hashing initial passwords (default: one per CPU).')
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['tenant']} if options['tenant'].isdigit() else {'slug': options['tenant']}
+        try:
+            tenant = Tenant.objects.get(**lookup)
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']} does not exist")
+
+        started = time.perf_counter()
+        try:
+            with open(options['file'], 'rb') as file:
+                created, skipped = import_users(
+                    tenant, read_csv(file), default_role=options['role'],
+                    hash_workers=max(1, options['workers']),
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        except UserImportError as e:
+            for error in e.errors:
+                line = f"line {error['line']}: " if 'line' in error else ''
+                self.stderr.write(f"{line}{error['error']}")
+            raise CommandError('Import failed; no users were created.')
+
+        for email in skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {email}: account already exists'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} users into {tenant.name} '
+            f'in {time.perf_counter() - started:.1f}s ({len(skipped)} skipped).'
+        ))
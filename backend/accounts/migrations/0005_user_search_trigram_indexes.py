@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:45
+
+from django.db import migrations
+
+
+# (table, column): icontains compiles to UPPER(column::text) LIKE UPPER(...)
+TRIGRAM_COLUMNS = (
+    ('auth_user', 'email'),
+    ('auth_user', 'first_name'),
+    ('auth_user', 'last_name'),
+    ('tenants_tenant', 'name'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # SQLite searches an FTS5 table instead (accounts.search)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_updated_at'),
+        ('tenants', '0006_tenant_json_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Storage names of the avatar thumbnails, by size in pixels.'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0006_tenant_json_gin_indexes'),
+        ('accounts', '0006_user_avatar_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(blank=True, help_text='Uploaded CSV file, until the import has finished.', upload_to='user_imports/')),
+                ('default_role', models.CharField(default='user', help_text='Role for rows that leave the role column empty.', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', help_text='Status of the import.', max_length=20)),
+                ('created_count', models.PositiveIntegerField(default=0, help_text='Number of users created.')),
+                ('skipped', models.JSONField(blank=True, default=list, help_text='Emails skipped because they already have an account.')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='Why the import failed, per line where known.')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('requested_by', models.ForeignKey(blank=True, help_text='User who uploaded the file.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('tenant', models.ForeignKey(help_text='Tenant the users are imported into.', on_delete=django.db.models.deletion.CASCADE, related_name='user_imports', to='tenants.tenant')),
+            ],
+            options={
+                'verbose_name': 'user import',
+                'verbose_name_plural': 'user imports',
+                'db_table': 'accounts_user_import',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
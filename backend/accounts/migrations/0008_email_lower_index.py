@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:16
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_import'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='auth_user_email_lower_idx'),
+        ),
+    ]
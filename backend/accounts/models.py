@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.db.models.functions import Lower
 from django.core.validators import EmailValidator
 from django.utils.translation import gettext_lazy as _
 
@@ -26,6 +27,12 @@ class UserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def get_by_natural_key(self, username):
+        # Login responses include the tenant and profile; load them together
+        return self.select_related('tenant', 'profile').get(
+            **{self.model.USERNAME_FIELD: username}
+        )
+
 
 class User(AbstractUser):
     """
@@ -81,12 +88,24 @@ class User(AbstractUser):
         help_text=_('User profile picture.')
     )
     
+    avatar_thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text=_('Storage names of the avatar thumbnails, by size in pixels.')
+    )
+    
     date_of_birth = models.DateField(
         blank=True,
         null=True,
         help_text=_('User date of birth.')
     )
     
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text=_('Last time the user was changed.')
+    )
+    
     # Override username to use email
     username = models.CharField(
         max_length=150,
@@ -106,6 +125,8 @@ class User(AbstractUser):
         db_table = 'auth_user'
         indexes = [
             models.Index(fields=['email']),
+            # Case-insensitive lookups, e.g. before inviting an email
+            models.Index(Lower('email'), name='auth_user_email_lower_idx'),
             models.Index(fields=['tenant']),
             models.Index(fields=['role']),
         ]
@@ -191,4 +212,86 @@ class UserProfile(models.Model):
         db_table = 'accounts_user_profile'
     
     def __str__(self):
-        return f"{self.user.email} Profile" 
\ No newline at end of file
+        return f"{self.user.email} Profile" 
+
+class UserImport(models.Model):
+    """
+    A CSV user import, run in the background by ``import_user_file``.
+    The uploaded file is deleted once the import has finished.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    tenant = models.ForeignKey(
+        'tenants.Tenant',
+        on_delete=models.CASCADE,
+        related_name='user_imports',
+        help_text=_('Tenant the users are imported into.')
+    )
+    
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text=_('User who uploaded the file.')
+    )
+    
+    file = models.FileField(
+        upload_to='user_imports/',
+        blank=True,
+        help_text=_('Uploaded CSV file, until the import has finished.')
+    )
+    
+    default_role = models.CharField(
+        max_length=20,
+        default='user',
+        help_text=_('Role for rows that leave the role column empty.')
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        help_text=_('Status of the import.')
+    )
+    
+    created_count = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Number of users created.')
+    )
+    
+    skipped = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_('Emails skipped because they already have an account.')
+    )
+    
+    errors = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_('Why the import failed, per line where known.')
+    )
+    
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'accounts_user_import'
+        verbose_name = _('user import')
+        verbose_name_plural = _('user imports')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"User import {self.pk} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
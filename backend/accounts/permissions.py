@@ -1,5 +1,72 @@
+from django.db.models import Q
 from rest_framework import permissions
 
+from .models import User
+
+
+class AccessContext:
+    """
+    Who is making a request, reduced to ids and role flags.
+    
+    Built once per request by ``get_access_context``, so permission checks
+    compare ids instead of loading the user's and the object's tenants.
+    """
+    __slots__ = ('user_id', 'tenant_id', 'is_admin', 'is_tenant_admin')
+    
+    def __init__(self, user):
+        self.user_id = user.pk
+        self.tenant_id = user.tenant_id
+        self.is_admin = user.is_admin
+        self.is_tenant_admin = user.is_tenant_administrator
+    
+    def owns_tenant(self, tenant_id):
+        return self.tenant_id is not None and tenant_id == self.tenant_id
+
+
+def get_access_context(request):
+    """The ``AccessContext`` of an authenticated request, computed on first use."""
+    # Stored on the HttpRequest so it is shared by every check of the request
+    http_request = getattr(request, '_request', request)
+    context = getattr(http_request, 'access_context', None)
+    if context is None:
+        context = http_request.access_context = AccessContext(request.user)
+    return context
+
+
+def _object_tenant_id(obj):
+    """Tenant id of ``obj`` or of the user it belongs to, without loading the tenant."""
+    if hasattr(obj, 'tenant_id'):
+        return obj.tenant_id
+    if hasattr(obj, 'user_id'):
+        return obj.user.tenant_id
+    return None
+
+
+def _object_user_id(obj):
+    """Id of the user owning ``obj``; users own themselves."""
+    if hasattr(obj, 'user_id'):
+        return obj.user_id
+    if isinstance(obj, User):
+        return obj.pk
+    return None
+
+
+def _tenant_lookup(model):
+    """Queryset lookup from ``model`` to its tenant id, mirroring ``_object_tenant_id``."""
+    field_names = {field.name for field in model._meta.concrete_fields}
+    if 'tenant' in field_names:
+        return 'tenant_id'
+    if 'user' in field_names:
+        return 'user__tenant_id'
+    return None
+
+
+def _user_lookup(model):
+    if issubclass(model, User):
+        return 'pk'
+    field_names = {field.name for field in model._meta.concrete_fields}
+    return 'user_id' if 'user' in field_names else None
+
 
 class IsTenantAdminOrReadOnly(permissions.BasePermission):
     """
@@ -11,34 +78,39 @@ class IsTenantAdminOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return request.user.is_authenticated
         
-        # Allow write operations for system admins
-        if request.user.is_admin:
-            return True
-        
-        # Allow write operations for tenant admins
-        if request.user.is_tenant_administrator:
-            return True
+        if not request.user.is_authenticated:
+            return False
         
-        return False
+        # Allow write operations for system admins and tenant admins
+        access = get_access_context(request)
+        return access.is_admin or access.is_tenant_admin
     
     def has_object_permission(self, request, view, obj):
         # Allow read operations for authenticated users
         if request.method in permissions.SAFE_METHODS:
             return request.user.is_authenticated
         
+        access = get_access_context(request)
         # Allow write operations for system admins
-        if request.user.is_admin:
+        if access.is_admin:
             return True
         
         # Allow write operations for tenant admins on their tenant's objects
-        if request.user.is_tenant_administrator:
-            # Check if the object belongs to the user's tenant
-            if hasattr(obj, 'tenant'):
-                return obj.tenant == request.user.tenant
-            elif hasattr(obj, 'user') and hasattr(obj.user, 'tenant'):
-                return obj.user.tenant == request.user.tenant
+        if access.is_tenant_admin:
+            return access.owns_tenant(_object_tenant_id(obj))
         
         return False
+    
+    def filter_queryset(self, request, queryset, view):
+        if request.method in permissions.SAFE_METHODS:
+            return queryset
+        access = get_access_context(request)
+        if access.is_admin:
+            return queryset
+        lookup = _tenant_lookup(queryset.model)
+        if access.is_tenant_admin and access.tenant_id is not None and lookup:
+            return queryset.filter(**{lookup: access.tenant_id})
+        return queryset.none()
 
 
 class IsOwnerOrTenantAdmin(permissions.BasePermission):
@@ -47,24 +119,33 @@ class IsOwnerOrTenantAdmin(permissions.BasePermission):
     """
     
     def has_object_permission(self, request, view, obj):
+        access = get_access_context(request)
         # Allow system admins
-        if request.user.is_admin:
+        if access.is_admin:
             return True
         
-        # Allow tenant admins on their tenant's objects
-        if request.user.is_tenant_administrator:
-            if hasattr(obj, 'tenant'):
-                return obj.tenant == request.user.tenant
-            elif hasattr(obj, 'user') and hasattr(obj.user, 'tenant'):
-                return obj.user.tenant == request.user.tenant
-        
         # Allow object owners
-        if hasattr(obj, 'user'):
-            return obj.user == request.user
-        elif hasattr(obj, 'id'):
-            return obj.id == request.user.id
+        if _object_user_id(obj) == access.user_id:
+            return True
+        
+        # Allow tenant admins on their tenant's objects
+        if access.is_tenant_admin:
+            return access.owns_tenant(_object_tenant_id(obj))
         
         return False
+    
+    def filter_queryset(self, request, queryset, view):
+        access = get_access_context(request)
+        if access.is_admin:
+            return queryset
+        allowed = Q(pk__in=[])
+        user_lookup = _user_lookup(queryset.model)
+        if user_lookup:
+            allowed |= Q(**{user_lookup: access.user_id})
+        tenant_lookup = _tenant_lookup(queryset.model)
+        if access.is_tenant_admin and access.tenant_id is not None and tenant_lookup:
+            allowed |= Q(**{tenant_lookup: access.tenant_id})
+        return queryset.filter(allowed)
 
 
 class IsSystemAdmin(permissions.BasePermission):
@@ -99,20 +180,54 @@ class IsTenantMember(permissions.BasePermission):
     """
     
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.tenant is not None
+        return request.user.is_authenticated and request.user.tenant_id is not None
     
     def has_object_permission(self, request, view, obj):
         if not request.user.is_authenticated:
             return False
         
+        access = get_access_context(request)
         # System admins can access everything
-        if request.user.is_admin:
+        if access.is_admin:
             return True
         
         # Check if object belongs to user's tenant
-        if hasattr(obj, 'tenant'):
-            return obj.tenant == request.user.tenant
-        elif hasattr(obj, 'user') and hasattr(obj.user, 'tenant'):
-            return obj.user.tenant == request.user.tenant
-        
-        return False 
\ No newline at end of file
+        return access.owns_tenant(_object_tenant_id(obj))
+    
+    def filter_queryset(self, request, queryset, view):
+        access = get_access_context(request)
+        if access.is_admin:
+            return queryset
+        lookup = _tenant_lookup(queryset.model)
+        if access.tenant_id is None or not lookup:
+            return queryset.none()
+        return queryset.filter(**{lookup: access.tenant_id})
+
+
+class PermissionQuerysetMixin:
+    """
+    View mixin applying object permissions as queryset filters.
+    
+    Permissions with a ``filter_queryset`` method restrict ``get_queryset``
+    and are skipped by ``check_object_permissions``: an object they would
+    reject is never found, so the view answers 404 instead of 403 and no
+    per-object check runs.
+    """
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for permission in self.get_permissions():
+            if hasattr(permission, 'filter_queryset'):
+                queryset = permission.filter_queryset(self.request, queryset, self)
+        return queryset
+    
+    def check_object_permissions(self, request, obj):
+        for permission in self.get_permissions():
+            if hasattr(permission, 'filter_queryset'):
+                continue
+            if not permission.has_object_permission(request, self, obj):
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None)
+                )
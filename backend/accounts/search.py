@@ -0,0 +1,177 @@
+"""
+Ranked user search across tenants.
+
+Users are matched on a substring of their email, first or last name, or
+their tenant's name, and returned best match first with keyset pagination.
+The cursor is the last ``(rank, id)`` seen, so a page costs the same at any
+depth. Searches run on the default database, which has every user.
+
+On PostgreSQL the ``ILIKE`` predicates are served by ``pg_trgm`` GIN
+indexes (migration 0005) and matches are ranked by trigram similarity.
+SQLite keeps an FTS5 shadow table using the trigram tokenizer, filled by
+triggers on ``auth_user`` and ``tenants_tenant``; it is synced after every
+``migrate``, since SQLite table rebuilds drop the triggers, and ranked by
+``bm25``.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from tenants.models import Tenant
+from .models import User
+
+
+SEARCH_TABLE = 'accounts_user_search'
+
+SEARCH_TRIGGERS = {
+    'accounts_user_search_insert': (
+        'AFTER INSERT ON auth_user BEGIN '
+        f'INSERT INTO {SEARCH_TABLE} (rowid, email, first_name, last_name, tenant_name, tenant_id) '
+        'VALUES (new.id, new.email, new.first_name, new.last_name, '
+        '(SELECT name FROM tenants_tenant WHERE id = new.tenant_id), new.tenant_id); END'
+    ),
+    'accounts_user_search_update': (
+        'AFTER UPDATE OF email, first_name, last_name, tenant_id ON auth_user BEGIN '
+        f'UPDATE {SEARCH_TABLE} SET email = new.email, first_name = new.first_name, '
+        'last_name = new.last_name, tenant_id = new.tenant_id, '
+        'tenant_name = (SELECT name FROM tenants_tenant WHERE id = new.tenant_id) '
+        'WHERE rowid = new.id; END'
+    ),
+    'accounts_user_search_delete': (
+        f'AFTER DELETE ON auth_user BEGIN DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; END'
+    ),
+    'accounts_user_search_tenant_rename': (
+        'AFTER UPDATE OF name ON tenants_tenant BEGIN '
+        f'UPDATE {SEARCH_TABLE} SET tenant_name = new.name WHERE tenant_id = new.id; END'
+    ),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def min_query_length():
+    # Trigrams need three characters to use either index
+    return getattr(settings, 'USER_SEARCH_MIN_LENGTH', 3)
+
+
+def encode_cursor(rank, user_id):
+    return base64.urlsafe_b64encode(json.dumps([rank, user_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        rank, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(user_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor('Invalid cursor.')
+
+
+def sync_search_table(connection):
+    """
+    Create the SQLite FTS5 table and its triggers where missing. The table
+    is refilled whenever a trigger had to be created, since rows may have
+    changed while it was absent. Returns whether it was refilled.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+            "email, first_name, last_name, tenant_name, tenant_id UNINDEXED, tokenize='trigram')"
+        )
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in SEARCH_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {SEARCH_TRIGGERS[name]}')
+        if missing:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} '
+                '(rowid, email, first_name, last_name, tenant_name, tenant_id) '
+                'SELECT u.id, u.email, u.first_name, u.last_name, t.name, u.tenant_id '
+                'FROM auth_user u LEFT JOIN tenants_tenant t ON t.id = u.tenant_id'
+            )
+    return bool(missing)
+
+
+def _search_sqlite(connection, query, tenant_id, after, limit):
+    # A quoted phrase matches the query as a substring of any column
+    params = ['"' + query.replace('"', '""') + '"']
+    sql = f'SELECT rowid, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    if tenant_id is not None:
+        sql += ' AND tenant_id = %s'
+        params.append(tenant_id)
+    if after is not None:
+        # bm25 ranks are negative; lower is better
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(user_id, rank) for user_id, rank in cursor.fetchall()]
+
+
+def _search_postgresql(query, tenant_id, after, limit):
+    users = User.objects.using(DEFAULT_DB_ALIAS)
+    if tenant_id is not None:
+        users = users.filter(tenant_id=tenant_id)
+    # Matching tenants are looked up first so every predicate below is
+    # served by a trigram index on auth_user
+    tenant_ids = list(
+        Tenant.objects.using(DEFAULT_DB_ALIAS)
+        .filter(name__icontains=query)
+        .values_list('pk', flat=True)
+    )
+    matches = (
+        Q(email__icontains=query)
+        | Q(first_name__icontains=query)
+        | Q(last_name__icontains=query)
+        | Q(tenant_id__in=tenant_ids)
+    )
+    users = users.filter(matches).annotate(rank=Greatest(
+        TrigramSimilarity('email', query),
+        TrigramSimilarity('first_name', query),
+        TrigramSimilarity('last_name', query),
+        TrigramSimilarity('tenant__name', query),
+    ))
+    if after is not None:
+        users = users.filter(Q(rank__lt=after[0]) | Q(rank=after[0], pk__gt=after[1]))
+    return [
+        (user_id, rank)
+        for user_id, rank in users.order_by('-rank', 'pk').values_list('pk', 'rank')[:limit]
+    ]
+
+
+def search_users(query, tenant_id=None, cursor=None, limit=20):
+    """
+    Return ``(users, next_cursor)`` for ``query``: up to ``limit`` users,
+    best match first, with their tenant and profile loaded. Pass
+    ``tenant_id`` to search one tenant only.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        matches = _search_postgresql(query, tenant_id, after, limit + 1)
+    else:
+        matches = _search_sqlite(connection, query, tenant_id, after, limit + 1)
+
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        next_cursor = encode_cursor(*matches[-1][::-1])
+    users = (
+        User.objects.using(DEFAULT_DB_ALIAS)
+        .select_related('tenant', 'profile')
+        .in_bulk([user_id for user_id, _ in matches])
+    )
+    return [users[user_id] for user_id, _ in matches if user_id in users], next_cursor
@@ -1,6 +1,11 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import get_user_model
-from .models import User, UserProfile
+from tenants.models import Tenant
+from .models import User, UserImport, UserProfile
+from .avatars import thumbnail_urls
+from .last_login import last_login_buffer
+from .tokens import TenantRefreshToken
 
 User = get_user_model()
 
@@ -17,15 +22,20 @@ class UserSerializer(serializers.ModelSerializer):
     """Serializer for user model."""
     profile = UserProfileSerializer(read_only=True)
     tenant_name = serializers.CharField(source='tenant.name', read_only=True)
+    avatar_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = [
             'id', 'email', 'first_name', 'last_name', 'role', 'is_tenant_admin',
-            'phone_number', 'avatar', 'date_of_birth', 'tenant', 'tenant_name',
-            'profile', 'is_active', 'date_joined', 'last_login'
+            'phone_number', 'avatar', 'avatar_thumbnails', 'date_of_birth', 'tenant',
+            'tenant_name', 'profile', 'is_active', 'date_joined', 'last_login'
         ]
-        read_only_fields = ['id', 'date_joined', 'last_login']
+        # Avatars are uploaded through /api/auth/avatar/
+        read_only_fields = ['id', 'avatar', 'date_joined', 'last_login']
+    
+    def get_avatar_thumbnails(self, obj):
+        return thumbnail_urls(obj, self.context.get('request'))
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -148,4 +158,58 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     def validate(self, attrs):
         if attrs['new_password'] != attrs['new_password_confirm']:
             raise serializers.ValidationError("Passwords don't match")
-        return attrs 
\ No newline at end of file
+        return attrs 
+
+
+class UserImportSerializer(serializers.Serializer):
+    """Serializer for importing users from a CSV file."""
+    file = serializers.FileField(
+        help_text='CSV with an email column and optional first_name, last_name, '
+                  'role, phone_number and password columns.'
+    )
+    role = serializers.ChoiceField(
+        choices=[('user', 'User'), ('tenant_admin', 'Tenant Admin')],
+        default='user',
+        help_text='Role for rows that leave the role column empty.'
+    )
+    tenant = serializers.PrimaryKeyRelatedField(
+        queryset=Tenant.objects.filter(is_active=True),
+        required=False,
+        help_text='Tenant to import into; system admins only.'
+    )
+    
+    def validate(self, attrs):
+        user = self.context['request'].user
+        if not user.is_admin or 'tenant' not in attrs:
+            # Tenant admins always import into their own tenant
+            if not user.tenant:
+                raise serializers.ValidationError({'tenant': 'No tenant associated'})
+            attrs['tenant'] = user.tenant
+        return attrs
+
+
+class UserImportStatusSerializer(serializers.ModelSerializer):
+    """Serializer for the progress and outcome of a user import."""
+    class Meta:
+        model = UserImport
+        fields = [
+            'id', 'tenant', 'requested_by', 'default_role', 'status', 'created_count',
+            'skipped', 'errors', 'started_at', 'completed_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class TenantTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issues tokens carrying tenant and role claims."""
+    token_class = TenantRefreshToken
+    
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # Written in batches rather than one UPDATE per login
+        last_login_buffer.record(self.user)
+        return data
+
+
+class TenantTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refreshes tokens carrying tenant and role claims."""
+    token_class = TenantRefreshToken
@@ -0,0 +1,34 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist import blacklist_store
+from .models import User, UserProfile
+from .search import sync_search_table
+from .user_cache import invalidate_cached_user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def share_blacklisted_token(sender, instance, created, **kwargs):
+    if created:
+        blacklist_store.add(instance.token.jti, instance.token.expires_at)
+
+
+@receiver(post_migrate)
+def sync_user_search_table(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Searches run on the default database; table rebuilds drop the triggers
+    if sender.name == 'accounts' and using == DEFAULT_DB_ALIAS:
+        sync_search_table(connections[using])
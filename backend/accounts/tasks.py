@@ -0,0 +1,48 @@
+from celery import shared_task
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from tenants.sharding import shard_for_tenant
+from .avatars import render_thumbnails
+from .blacklist import blacklist_store
+from .imports import run_import
+from .models import User, UserImport
+
+
+@shared_task
+def flush_expired_tokens():
+    """Delete expired outstanding and blacklisted tokens, then rebuild the filters."""
+    call_command('flushexpiredtokens')
+    blacklist_store.invalidate()
+
+
+@shared_task
+def generate_avatar_thumbnails(user_id):
+    """Render the thumbnails of a user's avatar and record them on the user."""
+    tenant_id = (
+        User.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk=user_id)
+        .values_list('tenant_id', flat=True)
+        .first()
+    )
+    alias = shard_for_tenant(tenant_id)
+    name = User.objects.using(alias).filter(pk=user_id).values_list('avatar', flat=True).first()
+    if not name:
+        return
+    thumbnails = render_thumbnails(name)
+    with transaction.atomic(using=alias):
+        user = User.objects.using(alias).select_for_update().filter(pk=user_id).first()
+        # The avatar may have been replaced while rendering
+        if user is None or user.avatar.name != name:
+            return
+        user.avatar_thumbnails = thumbnails
+        user.save(update_fields=['avatar_thumbnails', 'updated_at'])
+
+
+@shared_task
+def import_user_file(import_id):
+    """Import the users of an uploaded CSV file; nothing is written if it fails."""
+    user_import = UserImport.objects.select_related('tenant').get(pk=import_id)
+    if user_import.is_finished:
+        return user_import.created_count
+    return run_import(user_import).created_count
@@ -0,0 +1,46 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import blacklist_store
+from .user_cache import get_cached_user
+
+
+def add_user_claims(token, user):
+    """Embed what permission checks and shard routing need in ``token``."""
+    token['tenant_id'] = user.tenant_id
+    token['role'] = user.role
+    token['is_tenant_admin'] = user.is_tenant_admin
+
+
+class TenantRefreshToken(RefreshToken):
+    """
+    Refresh token carrying tenant and role claims. Access tokens minted from
+    it (at login or refresh) take the user's current claims, so role and
+    tenant changes apply from the next refresh. Blacklist checks go through
+    the per-process bloom filter.
+    """
+
+    def check_blacklist(self):
+        # The bloom filter answers most checks without a query
+        if blacklist_store.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        add_user_claims(token, user)
+        token.user = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        # Tokens created for a user in hand don't need to look it up again
+        user = getattr(self, 'user', None) or get_cached_user(
+            self[api_settings.USER_ID_CLAIM], self.get('tenant_id')
+        )
+        if user is not None:
+            add_user_claims(access, user)
+        return access
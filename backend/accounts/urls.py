@@ -6,6 +6,7 @@ from .views import (
     logout,
     me,
     update_profile,
+    avatar,
     UserListView,
     UserDetailView,
 )
@@ -23,4 +24,5 @@ urlpatterns = [
     # User Profile
     re_path(r'^profile/?$', update_profile, name='profile'),
     re_path(r'^me/?$', me, name='me'),
+    re_path(r'^avatar/?$', avatar, name='avatar'),
 ]
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Short-lived cache of authenticated users.
+
+Entries hold the user with its tenant and profile already loaded, so
+requests authenticated by JWT claims need no queries for either. They are
+dropped whenever the user or its profile is saved or deleted, which only
+reaches every process through a shared cache; with a cache local to each
+process users are not cached at all. The password hash is left out of the
+entries and loaded on first access.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from subscription_management.caching import is_shared_cache
+from tenants.sharding import shard_for_tenant
+from .models import User
+
+
+def user_cache_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def get_cached_user(user_id, tenant_id=None):
+    """
+    Return the user with ``user_id``, or None. ``tenant_id`` (from the token
+    claims) selects the shard to load it from on a cache miss.
+    """
+    key = user_cache_key(user_id)
+    shared = is_shared_cache(cache)
+    user = cache.get(key) if shared else None
+    if user is None:
+        # Stale claims may point at the wrong shard; the default database
+        # has every user
+        for alias in dict.fromkeys([shard_for_tenant(tenant_id), DEFAULT_DB_ALIAS]):
+            user = (
+                User.objects.using(alias)
+                .select_related('tenant', 'profile')
+                .defer('password')
+                .filter(pk=user_id)
+                .first()
+            )
+            if user is not None:
+                break
+        else:
+            return None
+        if shared:
+            cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 60))
+    return user
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def invalidate_cached_users(user_ids):
+    """Drop several users at once, for writes that skip the save signals."""
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import UserListView, UserDetailView
+from .views import UserListView, UserDetailView, UserImportView, UserImportDetailView, UserSearchView
 
 urlpatterns = [
     path('', UserListView.as_view(), name='user-list'),
+    path('search/', UserSearchView.as_view(), name='user-search'),
+    path('import/', UserImportView.as_view(), name='user-import'),
+    path('import/<int:pk>/', UserImportDetailView.as_view(), name='user-import-detail'),
     path('<int:pk>/', UserDetailView.as_view(), name='user-detail'),
 ] 
\ No newline at end of file
@@ -1,36 +1,53 @@
 from rest_framework import status, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
-from django.contrib.auth import authenticate
 from django.db import transaction
-from .models import User
-from .serializers import UserSerializer, UserRegistrationSerializer
+from .avatars import InvalidAvatar, store_avatar
+from .imports import start_import
+from .models import User, UserImport
+from .permissions import IsTenantAdmin
+from .search import InvalidCursor, min_query_length, search_users
+from .serializers import (
+    UserImportSerializer,
+    UserImportStatusSerializer,
+    UserSerializer,
+    UserRegistrationSerializer,
+)
+from .tasks import generate_avatar_thumbnails
+from .tokens import TenantRefreshToken
 from tenants.models import Tenant
 from tenants.serializers import TenantSerializer
+from subscription_management.conditional import (
+    ConditionalGetMixin,
+    apply_validator_headers,
+    conditional_response,
+)
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom token obtain view with tenant information."""
     
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
         
-        if response.status_code == 200:
-            # Add user and tenant information to response
-            user = authenticate(
-                request,
-                username=request.data.get('email'),
-                password=request.data.get('password')
-            )
-            if user:
-                response.data['user'] = UserSerializer(user).data
-                if user.tenant:
-                    response.data['tenant'] = TenantSerializer(user.tenant).data
+        # Reuse the user the serializer authenticated (with its tenant and
+        # profile) instead of hashing the password a second time
+        user = serializer.user
+        data = dict(serializer.validated_data)
+        data['user'] = UserSerializer(user).data
+        if user.tenant:
+            data['tenant'] = TenantSerializer(user.tenant).data
         
-        return response
+        return Response(data, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -55,7 +72,7 @@ def register(request):
                 user = serializer.save(tenant=tenant)
                 
                 # Generate tokens
-                refresh = RefreshToken.for_user(user)
+                refresh = TenantRefreshToken.for_user(user)
                 
                 return Response({
                     'user': UserSerializer(user).data,
@@ -82,7 +99,7 @@ def logout(request):
     try:
         refresh_token = request.data.get('refresh_token')
         if refresh_token:
-            token = RefreshToken(refresh_token)
+            token = TenantRefreshToken(refresh_token)
             token.blacklist()
         
         return Response({'message': 'Successfully logged out'})
@@ -93,18 +110,35 @@ def logout(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Everything the me response shows that can change
+ME_VALIDATOR_FIELDS = (
+    'updated_at', 'last_login', 'profile__updated_at', 'tenant__updated_at', 'tenant__user_count'
+)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def me(request):
     """Get current user information."""
-    serializer = UserSerializer(request.user)
+    validator = (
+        User.objects.filter(pk=request.user.pk).values_list(*ME_VALIDATOR_FIELDS).first()
+    )
+    headers = {}
+    if validator is not None:
+        not_modified, headers = conditional_response(request, f'me:{request.user.pk}', validator)
+        if not_modified is not None:
+            return not_modified
+    
+    # The cached user may predate the change the validator saw
+    user = User.objects.select_related('tenant', 'profile').get(pk=request.user.pk)
+    serializer = UserSerializer(user)
     data = serializer.data
     
     # Add tenant information
-    if request.user.tenant:
-        data['tenant'] = TenantSerializer(request.user.tenant).data
+    if user.tenant:
+        data['tenant'] = TenantSerializer(user.tenant).data
     
-    return Response(data)
+    return apply_validator_headers(Response(data), headers)
 
 
 @api_view(['PUT'])
@@ -120,18 +154,63 @@ def update_profile(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def avatar(request):
+    """Upload (POST, field "avatar") or remove (DELETE) the current user's avatar."""
+    user = User.objects.select_related('tenant', 'profile').get(pk=request.user.pk)
+    
+    if request.method == 'DELETE':
+        # Files are shared by identical uploads, so they are left in place
+        user.avatar = None
+        user.avatar_thumbnails = {}
+        user.save(update_fields=['avatar', 'avatar_thumbnails', 'updated_at'])
+        return Response(UserSerializer(user, context={'request': request}).data)
+    
+    upload = request.FILES.get('avatar')
+    if upload is None:
+        return Response({
+            'error': 'No file uploaded',
+            'details': 'Send the image in the "avatar" field'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        name = store_avatar(upload)
+    except InvalidAvatar as e:
+        return Response({
+            'error': 'Invalid avatar',
+            'details': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    with transaction.atomic(using=user._state.db):
+        user.avatar.name = name
+        user.avatar_thumbnails = {}
+        user.save(update_fields=['avatar', 'avatar_thumbnails', 'updated_at'])
+        # Thumbnails follow in the background
+        transaction.on_commit(
+            lambda: generate_avatar_thumbnails.delay(user.pk), using=user._state.db
+        )
+    
+    user.refresh_from_db(fields=['avatar_thumbnails'])
+    return Response(UserSerializer(user, context={'request': request}).data)
+
+
 class UserListView(generics.ListCreateAPIView):
     """List and create users (tenant-scoped)."""
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 4
+    search_fields = ['email', 'first_name', 'last_name', 'tenant__name']
     
     def get_queryset(self):
         # Filter users by tenant
         if self.request.user.is_admin:
-            return User.objects.all()
-        elif self.request.user.tenant:
-            return User.objects.filter(tenant=self.request.user.tenant)
-        return User.objects.none()
+            users = User.objects.all()
+        elif self.request.user.tenant_id:
+            users = User.objects.filter(tenant_id=self.request.user.tenant_id)
+        else:
+            return User.objects.none()
+        return users.select_related('tenant', 'profile')
     
     def perform_create(self, serializer):
         # Assign to current tenant if not admin
@@ -141,15 +220,107 @@ class UserListView(generics.ListCreateAPIView):
             serializer.save()
 
 
-class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserImportView(generics.GenericAPIView):
+    """
+    Import users from an uploaded CSV file in the background (Tenant admin
+    or Admin). Answers 202 with the import, whose progress is at
+    ``/api/users/import/<id>/``. Nothing is imported unless every row is
+    valid and the plan has room.
+    """
+    serializer_class = UserImportSerializer
+    permission_classes = [IsAuthenticated, IsTenantAdmin]
+    parser_classes = [MultiPartParser, FormParser]
+    
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_import = start_import(
+            serializer.validated_data['tenant'],
+            serializer.validated_data['file'],
+            default_role=serializer.validated_data['role'],
+            requested_by=request.user,
+        )
+        return Response(
+            UserImportStatusSerializer(user_import).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class UserImportDetailView(generics.RetrieveAPIView):
+    """
+    Retrieve the progress and outcome of a user import (Tenant admin or Admin).
+    """
+    serializer_class = UserImportStatusSerializer
+    permission_classes = [IsAuthenticated, IsTenantAdmin]
+    
+    def get_queryset(self):
+        if self.request.user.is_admin:
+            return UserImport.objects.all()
+        return UserImport.objects.filter(tenant_id=self.request.user.tenant_id)
+
+
+class UserSearchView(generics.GenericAPIView):
+    """
+    Search users by email, name or tenant name, best match first
+    (Tenant admin or Admin). Query parameters: q, cursor, page_size.
+    Tenant admins only find users of their own tenant.
+    """
+    serializer_class = UserSerializer
+    permission_classes = [IsAuthenticated, IsTenantAdmin]
+    query_budget = 3
+    max_page_size = 100
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < min_query_length():
+            return Response({
+                'error': 'Search query too short',
+                'details': f'Enter at least {min_query_length()} characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page_size = min(int(request.query_params.get('page_size', 20)), self.max_page_size)
+        except ValueError:
+            page_size = 20
+        
+        tenant_id = None if request.user.is_admin else request.user.tenant_id
+        if not request.user.is_admin and tenant_id is None:
+            return Response({'next': None, 'results': []})
+        
+        try:
+            users, next_cursor = search_users(
+                query,
+                tenant_id=tenant_id,
+                cursor=request.query_params.get('cursor'),
+                limit=max(page_size, 1),
+            )
+        except InvalidCursor as e:
+            return Response({
+                'error': 'Invalid cursor',
+                'details': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({
+            'next': next_url,
+            'results': self.get_serializer(users, many=True).data,
+        })
+
+
+class UserDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete user."""
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 4
+    etag_fields = ('updated_at', 'last_login', 'profile__updated_at', 'tenant__name')
     
     def get_queryset(self):
         # Filter users by tenant
         if self.request.user.is_admin:
-            return User.objects.all()
-        elif self.request.user.tenant:
-            return User.objects.filter(tenant=self.request.user.tenant)
-        return User.objects.none() 
\ No newline at end of file
+            users = User.objects.all()
+        elif self.request.user.tenant_id:
+            users = User.objects.filter(tenant_id=self.request.user.tenant_id)
+        else:
+            return User.objects.none()
+        return users.select_related('tenant', 'profile') 
\ No newline at end of file
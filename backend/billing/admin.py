@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Invoice, InvoiceItem, Payment, BillingSettings
+from tenants.admin import ShardedAdminMixin
 
 
 class InvoiceItemInline(admin.TabularInline):
@@ -8,7 +9,7 @@ class InvoiceItemInline(admin.TabularInline):
 
 
 @admin.register(Invoice)
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(ShardedAdminMixin, admin.ModelAdmin):
     list_display = ('invoice_number', 'tenant', 'status', 'total_amount', 'currency', 'due_date', 'is_paid')
     list_filter = ('status', 'currency', 'issue_date', 'due_date')
     search_fields = ('invoice_number', 'tenant__name')
@@ -38,7 +39,7 @@ class InvoiceAdmin(admin.ModelAdmin):
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ShardedAdminMixin, admin.ModelAdmin):
     list_display = ('external_payment_id', 'invoice', 'amount', 'currency', 'status', 'payment_method', 'processed_at')
     list_filter = ('status', 'payment_method', 'currency', 'processed_at')
     search_fields = ('external_payment_id', 'external_transaction_id', 'invoice__invoice_number')
@@ -46,7 +47,7 @@ class PaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(BillingSettings)
-class BillingSettingsAdmin(admin.ModelAdmin):
+class BillingSettingsAdmin(ShardedAdminMixin, admin.ModelAdmin):
     list_display = ('tenant', 'tax_rate', 'auto_billing', 'grace_period_days', 'default_payment_method')
     list_filter = ('auto_billing', 'default_payment_method')
     search_fields = ('tenant__name',) 
\ No newline at end of file
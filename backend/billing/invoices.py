@@ -0,0 +1,53 @@
+import calendar
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Invoice
+
+
+BILLING_CYCLE_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+
+INVOICE_DUE_DAYS = 30
+
+
+def add_months(value, months):
+    """``value`` moved ``months`` calendar months ahead, clamped to the month's last day."""
+    month = value.month - 1 + months
+    year = value.year + month // 12
+    month = month % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def next_period_end(period_start, billing_cycle):
+    """End of the billing period of ``billing_cycle`` starting at ``period_start``."""
+    return add_months(period_start, BILLING_CYCLE_MONTHS.get(billing_cycle, 1))
+
+
+def invoice_number(now=None):
+    # 64 random bits keep numbers unique across a month-start renewal run
+    return f"INV-{(now or timezone.now()).strftime('%Y%m')}-{uuid.uuid4().hex[:16].upper()}"
+
+
+def build_subscription_invoice(subscription, period_start, period_end, now=None):
+    """
+    Unsaved open invoice charging ``subscription``'s plan price for the
+    given billing period. The plan must be loaded or cheap to load.
+    """
+    now = now or timezone.now()
+    plan = subscription.plan
+    return Invoice(
+        tenant_id=subscription.tenant_id,
+        subscription=subscription,
+        invoice_number=invoice_number(now),
+        subtotal=plan.price,
+        total_amount=plan.price,
+        currency=plan.currency,
+        issue_date=now,
+        due_date=now + timedelta(days=INVOICE_DUE_DAYS),
+        billing_period_start=period_start,
+        billing_period_end=period_end,
+        status='open',
+    )
@@ -3,15 +3,19 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.db import transaction
+from django.db.models import Count, Max, Sum
 from django.utils import timezone
-from datetime import timedelta
 import uuid
 import random
 
+from .invoices import build_subscription_invoice, next_period_end
 from .models import Invoice, Payment, BillingSettings
 from .serializers import InvoiceSerializer, PaymentSerializer, BillingSettingsSerializer
 from subscriptions.models import Subscription
 from tenants.models import Tenant
+from tenants.sharding import all_shards, shard_for_tenant
+from subscription_management.conditional import ConditionalGetMixin
+from subscription_management.middleware import query_budget
 
 
 @api_view(['POST'])
@@ -26,7 +30,7 @@ def process_payment(request):
         invoice = Invoice.objects.get(id=invoice_id)
         
         # Check if user has permission to pay this invoice
-        if not request.user.is_admin and invoice.tenant != request.user.tenant:
+        if not request.user.is_admin and invoice.tenant_id != request.user.tenant_id:
             return Response(
                 {'error': 'Permission denied'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -87,42 +91,18 @@ def create_subscription_invoice(request):
         subscription = Subscription.objects.get(id=subscription_id)
         
         # Check permissions
-        if not request.user.is_admin and subscription.tenant != request.user.tenant:
+        if not request.user.is_admin and subscription.tenant_id != request.user.tenant_id:
             return Response(
                 {'error': 'Permission denied'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
         
         with transaction.atomic():
-            # Generate invoice number
-            invoice_number = f"INV-{timezone.now().strftime('%Y%m')}-{uuid.uuid4().hex[:8].upper()}"
-            
-            # Calculate billing period
             now = timezone.now()
-            if subscription.billing_cycle == 'monthly':
-                period_start = now
-                period_end = now + timedelta(days=30)
-            elif subscription.billing_cycle == 'yearly':
-                period_start = now
-                period_end = now + timedelta(days=365)
-            else:  # quarterly
-                period_start = now
-                period_end = now + timedelta(days=90)
-            
-            # Create invoice
-            invoice = Invoice.objects.create(
-                tenant=subscription.tenant,
-                subscription=subscription,
-                invoice_number=invoice_number,
-                subtotal=subscription.plan.price,
-                total_amount=subscription.plan.price,
-                currency=subscription.plan.currency,
-                issue_date=now,
-                due_date=now + timedelta(days=30),
-                billing_period_start=period_start,
-                billing_period_end=period_end,
-                status='open'
+            invoice = build_subscription_invoice(
+                subscription, now, next_period_end(now, subscription.plan.billing_cycle), now
             )
+            invoice.save()
             
             return Response({
                 'success': True,
@@ -145,13 +125,16 @@ class InvoiceListView(generics.ListCreateAPIView):
     """List and create invoices."""
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 5
     
     def get_queryset(self):
         if self.request.user.is_admin:
-            return Invoice.objects.all()
-        elif self.request.user.tenant:
-            return Invoice.objects.filter(tenant=self.request.user.tenant)
-        return Invoice.objects.none()
+            invoices = Invoice.objects.all()
+        elif self.request.user.tenant_id:
+            invoices = Invoice.objects.filter(tenant_id=self.request.user.tenant_id)
+        else:
+            return Invoice.objects.none()
+        return invoices.select_related('tenant').prefetch_related('items')
     
     def perform_create(self, serializer):
         if not self.request.user.is_admin and self.request.user.tenant:
@@ -160,32 +143,42 @@ class InvoiceListView(generics.ListCreateAPIView):
             serializer.save()
 
 
-class InvoiceDetailView(generics.RetrieveUpdateDestroyAPIView):
+class InvoiceDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete invoice."""
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 5
+    # Items have no updated_at; their count, newest and total stand in for it
+    etag_fields = (
+        'updated_at', 'tenant__name',
+        Count('items'), Max('items__created_at'), Sum('items__total_price'),
+    )
     
     def get_queryset(self):
         if self.request.user.is_admin:
-            return Invoice.objects.all()
-        elif self.request.user.tenant:
-            return Invoice.objects.filter(tenant=self.request.user.tenant)
-        return Invoice.objects.none()
+            invoices = Invoice.objects.all()
+        elif self.request.user.tenant_id:
+            invoices = Invoice.objects.filter(tenant_id=self.request.user.tenant_id)
+        else:
+            return Invoice.objects.none()
+        return invoices.select_related('tenant').prefetch_related('items')
 
 
 class PaymentListView(generics.ListCreateAPIView):
     """List and create payments."""
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 4
     
     def get_queryset(self):
         if self.request.user.is_admin:
             return Payment.objects.all()
-        elif self.request.user.tenant:
-            return Payment.objects.filter(invoice__tenant=self.request.user.tenant)
+        elif self.request.user.tenant_id:
+            return Payment.objects.filter(invoice__tenant_id=self.request.user.tenant_id)
         return Payment.objects.none()
 
 
+@query_budget(8)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def billing_history(request):
@@ -197,14 +190,19 @@ def billing_history(request):
         )
     
     # Get invoices for the tenant
-    invoices = Invoice.objects.filter(tenant=request.user.tenant).order_by('-issue_date')
+    invoices = (
+        Invoice.objects.filter(tenant=request.user.tenant)
+        .select_related('tenant')
+        .prefetch_related('items')
+        .order_by('-issue_date')
+    )
     
     # Get payments for the tenant
     payments = Payment.objects.filter(invoice__tenant=request.user.tenant).order_by('-created_at')
     
-    # Calculate summary
-    total_invoiced = sum(invoice.total_amount for invoice in invoices)
-    total_paid = sum(payment.amount for payment in payments if payment.is_successful)
+    # Calculate summary in the database rather than loading every row
+    total_invoiced = invoices.aggregate(total=Sum('total_amount'))['total'] or 0
+    total_paid = payments.filter(status='succeeded').aggregate(total=Sum('amount'))['total'] or 0
     outstanding = total_invoiced - total_paid
     
     return Response({
@@ -226,11 +224,16 @@ def billing_analytics(request):
     """Get billing analytics for admin or tenant."""
     if request.user.is_admin:
         # System-wide analytics
+        # Tenant-owned rows may be spread across shards
         tenants = Tenant.objects.all()
         total_revenue = sum(
-            Payment.objects.filter(status='succeeded').values_list('amount', flat=True)
+            sum(Payment.objects.using(alias).filter(status='succeeded').values_list('amount', flat=True))
+            for alias in all_shards()
+        )
+        active_subscriptions = sum(
+            Subscription.objects.using(alias).filter(status='active').count()
+            for alias in all_shards()
         )
-        active_subscriptions = Subscription.objects.filter(status='active').count()
         
         return Response({
             'total_tenants': tenants.count(),
@@ -245,6 +248,11 @@ def billing_analytics(request):
         payments = Payment.objects.filter(invoice__tenant=tenant)
         
         total_spent = sum(payment.amount for payment in payments if payment.is_successful)
+        tenant = (
+            Tenant.objects.using(shard_for_tenant(tenant.pk))
+            .with_active_plan()
+            .get(pk=tenant.pk)
+        )
         subscription = tenant.active_subscription
         
         return Response({
@@ -0,0 +1,15 @@
+"""
+What may rely on the default cache.
+
+Local memory (and dummy) caches are private to each process, so entries
+one worker writes are never seen, counted or invalidated by the others.
+Features that share state between processes through the cache check
+``is_shared_cache`` and stay off without a shared backend.
+"""
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared_cache(cache):
+    """Whether every process sees the same entries in ``cache``."""
+    return not isinstance(cache, (LocMemCache, DummyCache))
@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'subscription_management.settings')
+
+app = Celery('subscription_management')
+
+# Read CELERY_* settings from the Django settings module
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
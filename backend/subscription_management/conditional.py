@@ -0,0 +1,98 @@
+"""
+Conditional GET for detail endpoints.
+
+A resource's validator is a handful of columns (``updated_at`` and whatever
+else its serializer shows that can change without touching it), read with
+``values_list()`` instead of loading the row. The ETag hashes the validator
+together with ``API_SCHEMA_VERSION``, so bumping the version invalidates
+every cached representation after a serializer change. When the client's
+``If-None-Match`` (or ``If-Modified-Since``, for validators made of
+timestamps only) still matches, the view answers 304 without loading or
+serializing anything.
+"""
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def compute_etag(scope, validator):
+    version = getattr(settings, 'API_SCHEMA_VERSION', '1')
+    digest = hashlib.sha1(f'{version}:{scope}:{validator!r}'.encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def last_modified(validator):
+    """
+    Newest timestamp in ``validator``, as a POSIX timestamp. ``None`` unless
+    every part of it is a timestamp: a change to a count or a name wouldn't
+    show in ``If-Modified-Since``, so only the ETag can validate those.
+    """
+    if not validator or not all(isinstance(value, datetime) for value in validator):
+        return None
+    return max(value.timestamp() for value in validator)
+
+
+def conditional_response(request, scope, validator):
+    """
+    Return ``(not_modified, headers)``: a 304 response when the client's
+    copy is current (else ``None``), and the validator headers to put on
+    a full response.
+    """
+    etag = compute_etag(scope, validator)
+    modified = last_modified(validator)
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(modified) if modified is not None else None
+    )
+    headers = {'ETag': etag}
+    if modified is not None:
+        headers['Last-Modified'] = http_date(modified)
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified.headers[name] = value
+        patch_cache_control(not_modified, private=True, no_cache=True)
+    return not_modified, headers
+
+
+def apply_validator_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+    # Clients may keep the representation but must revalidate it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified support for retrieve views.
+
+    ``etag_fields`` lists the lookups or expressions making up the
+    validator. The validator is read through ``get_queryset()`` and the
+    view's filters, so a resource outside the requester's scope is not
+    found; object permissions are not evaluated for a 304, so views must
+    scope their querysets.
+    """
+    etag_fields = ('updated_at',)
+
+    def get_validator(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        # The related-row joins of the serializer's queryset aren't needed
+        return queryset.select_related(None).prefetch_related(None).values_list(
+            *self.etag_fields
+        ).first()
+
+    def retrieve(self, request, *args, **kwargs):
+        validator = self.get_validator()
+        if validator is None:
+            return super().retrieve(request, *args, **kwargs)
+        not_modified, headers = conditional_response(
+            request, type(self).__name__, validator
+        )
+        if not_modified is not None:
+            return not_modified
+        return apply_validator_headers(super().retrieve(request, *args, **kwargs), headers)
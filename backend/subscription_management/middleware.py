@@ -0,0 +1,107 @@
+"""
+Per-request query instrumentation.
+
+``QueryBudgetMiddleware`` counts the queries and database time of every
+request on all configured databases, reports them in ``X-Query-Count`` and
+``Server-Timing`` headers and logs SQL shapes repeated often enough to
+suggest an N+1. Views declare an upper bound with a ``query_budget``
+attribute (or the ``query_budget`` decorator for function views); going
+over it is logged, and raises ``QueryBudgetExceeded`` when
+``QUERY_BUDGET_ENFORCE`` is on, as it should be in tests.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Collapse IN lists so batches of different sizes share one shape
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Declare the most queries a function view may run."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def _view_budget(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        # DRF and Django class-based views keep the class on the function
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[_IN_LIST.sub('IN (...)', sql)] += 1
+
+    def repeated_shapes(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = getattr(settings, 'QUERY_BUDGET_HEADERS', settings.DEBUG)
+        self.enforce = getattr(settings, 'QUERY_BUDGET_ENFORCE', False)
+        self.repeat_threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 5)
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        self._report(request, stats)
+        if self.headers:
+            response['X-Query-Count'] = str(stats.count)
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                f'total;dur={elapsed * 1000:.1f}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = _view_budget(view_func)
+
+    def _report(self, request, stats):
+        for shape, count in stats.repeated_shapes(self.repeat_threshold):
+            logger.warning('Possible N+1 on %s %s: %d x %s',
+                           request.method, request.path, count, shape)
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and stats.count > budget:
+            message = (f'{request.method} {request.path} ran {stats.count} queries, '
+                       f'over its budget of {budget}')
+            if self.enforce:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
@@ -1,4 +1,6 @@
 import os
+import json
+import sys
 from pathlib import Path
 from datetime import timedelta
 
@@ -11,6 +13,9 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-change-this-in-produc
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
 
+# Running under `manage.py test`
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1,0.0.0.0').split(',')
 
 # Application definition
@@ -25,6 +30,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
     'drf_yasg',
@@ -38,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it sees the queries of every other middleware
+    'subscription_management.middleware.QueryBudgetMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -50,6 +58,8 @@ MIDDLEWARE = [
     
     # Custom middleware
     'tenants.middleware.TenantMiddleware',
+    'tenants.middleware.TenantDatabaseMiddleware',
+    'subscriptions.middleware.ApiUsageMiddleware',
 ]
 
 ROOT_URLCONF = 'subscription_management.urls'
@@ -95,9 +105,55 @@ else:
             'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres123'),
             'HOST': os.environ.get('DB_HOST', 'database'),
             'PORT': os.environ.get('DB_PORT', '5432'),
+            # Keep connections open between requests
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
+# Tenant sharding
+# Extra database aliases for tenant-owned data, e.g. TENANT_SHARDS=shard1,shard2.
+# Shards reuse the default connection settings with their own database name
+# (a separate SQLite file locally). Tenants are placed by id modulo the number
+# of shards unless pinned in TENANT_SHARD_MAP, a JSON object of tenant id to
+# alias; pin existing tenants there before adding shards. Re-pinning a tenant
+# does not move its rows (see tenants.sharding).
+TENANT_SHARDS = ['default'] + [
+    alias.strip() for alias in os.environ.get('TENANT_SHARDS', '').split(',') if alias.strip()
+]
+TENANT_SHARD_MAP = json.loads(os.environ.get('TENANT_SHARD_MAP', '{}'))
+# Tenant-owned ids on the n-th shard start at n * TENANT_SHARD_ID_RANGE
+# (set up by `manage.py migrate_shards`) so they are unique across shards.
+TENANT_SHARD_ID_RANGE = 10 ** 12
+
+for _alias in TENANT_SHARDS[1:]:
+    if DB_ENGINE == 'sqlite3':
+        _name = os.path.join(BASE_DIR, f'db_{_alias}.sqlite3')
+    else:
+        _name = os.environ.get(f'DB_NAME_{_alias.upper()}', f"{DATABASES['default']['NAME']}_{_alias}")
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'NAME': _name,
+        'HOST': os.environ.get(f'DB_HOST_{_alias.upper()}', DATABASES['default'].get('HOST', '')),
+    }
+
+DATABASE_ROUTERS = ['tenants.routers.TenantShardRouter']
+
+# Tenant isolation
+# 'row' scopes queries by tenant; 'schema' (PostgreSQL only) additionally keeps
+# the TENANT_SCHEMA_MODELS tables of each tenant in its own schema, created with
+# `manage.py migrate_tenant_schemas`. Catalog tables such as plans stay shared
+# in public.
+TENANT_ISOLATION_MODE = os.environ.get('TENANT_ISOLATION_MODE', 'row').lower()
+TENANT_SCHEMA_MODELS = [
+    'subscriptions.Subscription',
+    'subscriptions.PlanChange',
+    'billing.Invoice',
+    'billing.InvoiceItem',
+    'billing.Payment',
+    'billing.BillingSettings',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -132,6 +188,13 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Avatar uploads (accounts.avatars): largest accepted file and image (in
+# pixels, as decoded), and the square thumbnail sizes rendered in the
+# background
+AVATAR_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+AVATAR_MAX_PIXELS = 25_000_000
+AVATAR_THUMBNAIL_SIZES = (64, 128, 256)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -141,7 +204,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.TenantJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -151,6 +214,9 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'subscriptions.quotas.PlanQuotaThrottle',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': (
@@ -164,7 +230,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # Buffered by accounts.last_login instead of saved on every login
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'VERIFYING_KEY': None,
@@ -173,8 +240,39 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.TenantTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.TenantTokenRefreshSerializer',
 }
 
+# Longest a login may wait before its last_login is written (0 writes at
+# once), and the most buffered logins before a flush
+LAST_LOGIN_MAX_STALENESS = int(os.environ.get('LAST_LOGIN_MAX_STALENESS', 60))
+LAST_LOGIN_FLUSH_SIZE = 500
+
+# Part of every ETag (subscription_management.conditional); bump it when a
+# serializer changes shape so clients drop their cached representations
+API_SCHEMA_VERSION = '1'
+
+# Query instrumentation (subscription_management.middleware). The headers
+# expose query counts and timings, so they are only on in development.
+# Requests over their budget fail in tests, or wherever QUERY_BUDGET_ENFORCE
+# is turned on.
+QUERY_BUDGET_HEADERS = DEBUG
+QUERY_BUDGET_ENFORCE = TESTING or os.environ.get('QUERY_BUDGET_ENFORCE', 'False').lower() == 'true'
+QUERY_REPEAT_THRESHOLD = 5
+
+# Seconds an authenticated user (with tenant and profile) stays cached; only
+# with a shared cache (CACHE_BACKEND=redis)
+USER_CACHE_TIMEOUT = 60
+
+# Per-process bloom filter over blacklisted refresh tokens (accounts.blacklist)
+TOKEN_BLACKLIST_BLOOM_CAPACITY = 100000
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = 0.001
+TOKEN_BLACKLIST_SYNC_INTERVAL = 5
+# Ids below the highest one seen that each sync reads again, for rows that
+# committed out of id order
+TOKEN_BLACKLIST_SYNC_OVERLAP = 1000
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.environ.get(
     'CORS_ALLOWED_ORIGINS',
@@ -206,6 +304,24 @@ CSRF_TRUSTED_ORIGINS = os.environ.get(
 # Redis settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
 
+# Cache
+# Shared cache in Redis when CACHE_BACKEND is set to 'redis', local memory otherwise.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem').lower()
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Celery settings
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -213,6 +329,25 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Tasks go to the worker (see docker-compose.yml). They run inline under
+# `manage.py test`, and in local development with CELERY_TASK_ALWAYS_EAGER=True
+# when no worker is running.
+CELERY_TASK_ALWAYS_EAGER = TESTING or os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_BEAT_SCHEDULE = {
+    'expire-stale-invitations': {
+        'task': 'tenants.tasks.expire_stale_invitations',
+        'schedule': 15 * 60,
+    },
+    'flush-expired-tokens': {
+        'task': 'accounts.tasks.flush_expired_tokens',
+        'schedule': 24 * 60 * 60,
+    },
+    'renew-due-subscriptions': {
+        'task': 'subscriptions.tasks.renew_due_subscriptions',
+        'schedule': 15 * 60,
+    },
+}
 
 # Stripe settings (for billing simulation)
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', 'pk_test_mock_key')
@@ -244,13 +379,74 @@ LOGGING = {
 TENANT_MODEL = 'tenants.Tenant'
 TENANT_DOMAIN_MODEL = 'tenants.Domain'
 
+# Tenant resolution cache (seconds). The per-process LRU bounds how long other
+# workers may keep serving an entry after it was invalidated.
+TENANT_RESOLVER_CACHE_TIMEOUT = int(os.environ.get('TENANT_RESOLVER_CACHE_TIMEOUT', 300))
+TENANT_RESOLVER_MISS_TIMEOUT = int(os.environ.get('TENANT_RESOLVER_MISS_TIMEOUT', 60))
+TENANT_RESOLVER_LOCAL_TIMEOUT = int(os.environ.get('TENANT_RESOLVER_LOCAL_TIMEOUT', 5))
+TENANT_RESOLVER_LOCAL_MAXSIZE = int(os.environ.get('TENANT_RESOLVER_LOCAL_MAXSIZE', 1024))
+
 # Email settings (for development)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-EMAIL_HOST = 'localhost'
-EMAIL_PORT = 1025
-EMAIL_USE_TLS = False
-EMAIL_HOST_USER = ''
-EMAIL_HOST_PASSWORD = ''
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '1025'))
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False').lower() == 'true'
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@localhost')
+
+# Tenant invitations
+FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+TENANT_INVITATION_EXPIRY_DAYS = 7
+# Largest number of emails accepted by one bulk invitation request
+TENANT_INVITATION_BULK_LIMIT = 5000
+# Rows per INSERT, and emails per delivery task (one SMTP connection each)
+TENANT_INVITATION_BATCH_SIZE = 500
+# Rows moved to 'expired' per statement by the expiry sweep
+TENANT_INVITATION_EXPIRE_BATCH_SIZE = 1000
+
+# Rows deleted per transaction when offboarding a tenant
+TENANT_OFFBOARDING_BATCH_SIZE = 1000
+
+# Rows fetched per round trip when streaming a tenant export
+TENANT_EXPORT_CHUNK_SIZE = 2000
+
+# CSV user imports: most rows per file and rows per INSERT
+USER_IMPORT_MAX_ROWS = 10000
+USER_IMPORT_BATCH_SIZE = 500
+
+# Shortest user search query; trigram indexes need three characters
+USER_SEARCH_MIN_LENGTH = 3
+
+# Rendered plan catalog: how long a version stays in the cache, and how long
+# processes wait for another one rebuilding it (seconds)
+PLAN_CATALOG_CACHE_TIMEOUT = 86400
+PLAN_CATALOG_LOCK_TIMEOUT = 5
+
+# API call metering: seconds between adding each process's buffered calls
+# to the shared counters, and between writing the totals to subscriptions.
+# Calls are only metered with a shared cache (CACHE_BACKEND=redis)
+API_METERING_FLUSH_INTERVAL = int(os.environ.get('API_METERING_FLUSH_INTERVAL', 5))
+API_METERING_PERSIST_INTERVAL = int(os.environ.get('API_METERING_PERSIST_INTERVAL', 60))
+
+# API quotas: default calls per second per tenant (plans may set
+# metadata['api_burst_per_second']; 0 disables), seconds between re-reading
+# a tenant's monthly total, and how long plan limits are cached in each
+# process and in the shared cache
+API_QUOTA_BURST = int(os.environ.get('API_QUOTA_BURST', 50))
+API_QUOTA_SYNC_INTERVAL = 1
+API_QUOTA_LOCAL_TIMEOUT = 5
+API_QUOTA_LOCAL_MAXSIZE = 1024
+API_QUOTA_LIMITS_TIMEOUT = 300
+
+# Subscriptions claimed and renewed per transaction
+SUBSCRIPTION_RENEWAL_BATCH_SIZE = 500
+
+# Tenant JSON keys filtered often enough to index on SQLite, e.g.
+# 'settings.features.beta'. PostgreSQL indexes every key with GIN instead.
+TENANT_JSON_INDEXED_KEYS = [
+    key.strip() for key in os.environ.get('TENANT_JSON_INDEXED_KEYS', '').split(',') if key.strip()
+]
 
 # Security settings
 if not DEBUG:
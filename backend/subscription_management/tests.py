@@ -0,0 +1,117 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from accounts.tokens import TenantRefreshToken
+from billing.models import Invoice, InvoiceItem, Payment
+from subscriptions.models import Plan, Subscription
+from tenants.models import Tenant
+from .middleware import QueryBudgetExceeded, query_budget
+
+
+@query_budget(1)
+def over_budget_view(request):
+    Tenant.objects.count()
+    Tenant.objects.count()
+    return HttpResponse()
+
+
+urlpatterns = [
+    path('over-budget/', over_budget_view),
+]
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTests(TestCase):
+    """
+    List and detail endpoints stay within their ``query_budget`` with
+    several rows of every kind, so an N+1 fails the request.
+    """
+
+    ROWS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='Budget', slug='budget')
+        cls.admin = User.objects.create_user(
+            email='admin@budget.test', password='pw12345678', tenant=cls.tenant, role='tenant_admin'
+        )
+        for i in range(cls.ROWS):
+            User.objects.create_user(email=f'user{i}@budget.test', password='pw12345678', tenant=cls.tenant)
+        plan = Plan.objects.create(name='Budget plan', slug='budget-plan', price=Decimal('10.00'))
+        now = timezone.now()
+        for i in range(cls.ROWS):
+            subscription = Subscription.objects.create(
+                tenant=cls.tenant, plan=plan, status='active',
+                current_period_start=now, current_period_end=now + timedelta(days=30),
+            )
+            invoice = Invoice.objects.create(
+                tenant=cls.tenant, subscription=subscription, invoice_number=f'INV-BUDGET-{i}',
+                subtotal=Decimal('10.00'), total_amount=Decimal('10.00'), status='open',
+                issue_date=now, due_date=now + timedelta(days=30),
+                billing_period_start=now, billing_period_end=now + timedelta(days=30),
+            )
+            for j in range(2):
+                InvoiceItem.objects.create(
+                    invoice=invoice, description=f'Item {j}', unit_price=Decimal('5.00'),
+                    total_price=Decimal('5.00'),
+                )
+            Payment.objects.create(invoice=invoice, amount=Decimal('10.00'))
+        cls.subscription = subscription
+        cls.invoice = invoice
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        token = TenantRefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        # Budgets are for warm caches: the tenant's plan limits and usage
+        self.client.get('/api/auth/me/')
+
+    def assertWithinBudget(self, url):
+        # Over-budget requests raise QueryBudgetExceeded through the client
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_list_endpoints(self):
+        for url in [
+            '/api/users/',
+            '/api/subscriptions/',
+            '/api/billing/invoices/',
+            '/api/billing/payments/',
+            '/api/billing/history/',
+        ]:
+            with self.subTest(url=url):
+                self.assertWithinBudget(url)
+
+    def test_detail_endpoints(self):
+        for url in [
+            f'/api/users/{self.admin.pk}/',
+            f'/api/subscriptions/{self.subscription.pk}/',
+            f'/api/billing/invoices/{self.invoice.pk}/',
+        ]:
+            with self.subTest(url=url):
+                self.assertWithinBudget(url)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class QueryBudgetEnforcementTests(TestCase):
+    """Going over a budget fails the request only when enforcement is on."""
+
+    @override_settings(QUERY_BUDGET_ENFORCE=True)
+    def test_over_budget_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/over-budget/')
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_over_budget_only_logged_when_not_enforced(self):
+        with self.assertLogs('subscription_management.middleware', 'WARNING'):
+            response = self.client.get('/over-budget/')
+        self.assertEqual(response.status_code, 200)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Plan, Subscription, PlanChange
+from tenants.admin import ShardedAdminMixin
 
 
 @admin.register(Plan)
@@ -29,7 +30,7 @@ class PlanAdmin(admin.ModelAdmin):
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(ShardedAdminMixin, admin.ModelAdmin):
     list_display = ('tenant', 'plan', 'status', 'current_period_end', 'is_active')
     list_filter = ('status', 'plan', 'tenant', 'created_at')
     search_fields = ('tenant__name', 'plan__name')
@@ -61,7 +62,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
 
 
 @admin.register(PlanChange)
-class PlanChangeAdmin(admin.ModelAdmin):
+class PlanChangeAdmin(ShardedAdminMixin, admin.ModelAdmin):
     list_display = ('subscription', 'old_plan', 'new_plan', 'changed_by', 'effective_date')
     list_filter = ('effective_date', 'old_plan', 'new_plan')
     search_fields = ('subscription__tenant__name', 'reason')
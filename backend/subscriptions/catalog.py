@@ -0,0 +1,125 @@
+"""
+Cached plan catalog.
+
+Every tenant's Plans page lists the active plans, which change a few times a
+year. The listing is rendered once to JSON bytes and kept in the shared
+cache under the catalog version, a counter that saving or deleting a
+``Plan`` bumps once the transaction commits; old versions are never read
+again and simply expire. Each process also keeps the bytes of the version
+it saw last, so a request costs one cache read and no query.
+
+When a version is missing, one request per process takes a local lock and
+one process takes a short-lived lock in the shared cache to rebuild it; the
+others wait for the result for up to ``PLAN_CATALOG_LOCK_TIMEOUT`` seconds
+before rendering it themselves.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .models import Plan
+from .serializers import PlanSerializer
+
+
+VERSION_KEY = 'subscriptions:plan_catalog:version'
+
+
+def catalog_key(version):
+    schema = getattr(settings, 'API_SCHEMA_VERSION', '1')
+    return f'subscriptions:plan_catalog:{schema}:{version}'
+
+
+def rebuild_lock_key(version):
+    return f'subscriptions:plan_catalog:rebuild:{version}'
+
+
+def render_catalog():
+    """
+    Render the active plans as the first page of ``PlanListView`` would.
+    Returns ``(etag, content)``, or ``(None, None)`` when the plans don't fit
+    on one page and must be paginated per request.
+    """
+    plans = list(Plan.objects.filter(is_active=True))
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE')
+    if page_size and len(plans) > page_size:
+        return None, None
+    content = JSONRenderer().render({
+        'count': len(plans),
+        'next': None,
+        'previous': None,
+        'results': PlanSerializer(plans, many=True).data,
+    })
+    return quote_etag(hashlib.sha1(content).hexdigest()), content
+
+
+class PlanCatalog:
+    """Per-process view of the cached plan catalog."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = None
+
+    def version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # Seeded from the clock so a version evicted from the cache is
+            # never reused for different plans
+            cache.add(VERSION_KEY, time.time_ns(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def get(self):
+        """Return ``(etag, content)`` of the current catalog."""
+        version = self.version()
+        local = self._local
+        if local is not None and local[0] == version:
+            return local[1]
+        entry = cache.get(catalog_key(version))
+        if entry is None:
+            entry = self._rebuild(version)
+        self._local = (version, entry)
+        return entry
+
+    def _rebuild(self, version):
+        key = catalog_key(version)
+        # Other threads of this process wait for the one rebuilding
+        with self._lock:
+            local = self._local
+            if local is not None and local[0] == version:
+                return local[1]
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+            timeout = getattr(settings, 'PLAN_CATALOG_LOCK_TIMEOUT', 5)
+            lock_key = rebuild_lock_key(version)
+            locked = cache.add(lock_key, True, timeout)
+            if not locked:
+                # Another process is rebuilding it
+                deadline = time.monotonic() + timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return entry
+            try:
+                entry = render_catalog()
+                cache.set(key, entry, getattr(settings, 'PLAN_CATALOG_CACHE_TIMEOUT', 86400))
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+            return entry
+
+    def invalidate(self):
+        """Make every process render the catalog again on its next request."""
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+plan_catalog = PlanCatalog()
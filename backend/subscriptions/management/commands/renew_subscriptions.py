@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from subscriptions.renewals import renew_subscriptions
+
+
+class Command(BaseCommand):
+    help = 'Renews subscriptions whose current period has ended and invoices the new period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Subscriptions claimed per transaction (default: SUBSCRIPTION_RENEWAL_BATCH_SIZE).')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches.')
+        parser.add_argument('--database', action='append', dest='aliases', default=None,
+                            help='Only renew on this database; repeat for several (default: every shard).')
+
+    def handle(self, *args, **options):
+        metrics = renew_subscriptions(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            aliases=options['aliases'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Renewed {metrics['renewed']} and cancelled {metrics['cancelled']} subscription(s) "
+            f"in {metrics['batches']} batch(es) ({metrics['seconds']}s, {metrics['rows_per_second']} rows/s)."
+        ))
@@ -0,0 +1,211 @@
+"""
+API call metering.
+
+``ApiUsageMiddleware`` records every authenticated API call by appending the
+caller's tenant id to a per-process deque, which needs no lock and no I/O.
+A daemon thread drains the deque every ``API_METERING_FLUSH_INTERVAL``
+seconds and adds the aggregated counts to per-tenant monthly counters in
+the shared cache, which are the live totals. Every
+``API_METERING_PERSIST_INTERVAL`` seconds the totals of the tenants this
+process has seen are written to ``current_usage['api_calls']`` of their
+active subscriptions, one locked batch per database.
+
+A worker that has metered calls flushes and persists what it holds when it
+exits cleanly; one that crashes loses at most a flush interval of its own
+calls. A counter missing
+from the cache (evicted, or the cache restarted) is seeded again from the
+persisted total, so it loses at most a persist interval.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+from tenants.models import Tenant
+from tenants.sharding import shard_for_tenant
+from .models import Subscription
+
+
+logger = logging.getLogger(__name__)
+
+# Counters outlive their month by a few days so late persists still see them
+COUNTER_TIMEOUT = 40 * 24 * 60 * 60
+
+
+def current_period():
+    """The metering period, a calendar month in UTC such as ``'2024-05'``."""
+    return timezone.now().strftime('%Y-%m')
+
+
+def usage_key(tenant_id, period):
+    return f'subscriptions:api_calls:{period}:{tenant_id}'
+
+
+def persisted_api_calls(tenant_id, period):
+    """The total last persisted for ``tenant_id`` in ``period``."""
+    alias = shard_for_tenant(tenant_id)
+    usage = (
+        Subscription.objects.using(alias)
+        .filter(pk__in=Tenant.objects.using(alias).filter(pk=tenant_id).values('active_subscription'))
+        .values_list('current_usage', flat=True)
+        .first()
+    ) or {}
+    return usage.get('api_calls', 0) if usage.get('api_calls_period') == period else 0
+
+
+def add_api_calls(tenant_id, count, period=None):
+    """Add ``count`` calls to the shared counter of ``tenant_id``; returns the total."""
+    key = usage_key(tenant_id, period or current_period())
+    try:
+        return cache.incr(key, count)
+    except ValueError:
+        # Counters are only ever seeded once, by whoever gets there first
+        total = persisted_api_calls(tenant_id, period or current_period()) + count
+        if cache.add(key, total, COUNTER_TIMEOUT):
+            return total
+        return cache.incr(key, count)
+
+
+def api_calls(tenant_id, period=None):
+    """Live number of calls ``tenant_id`` has made in ``period`` (default: this month)."""
+    period = period or current_period()
+    total = cache.get(usage_key(tenant_id, period))
+    if total is None:
+        total = persisted_api_calls(tenant_id, period)
+    return total
+
+
+def persist_api_calls(tenant_ids, period):
+    """
+    Write the shared totals of ``tenant_ids`` to their active subscriptions.
+    Totals only grow within a period, so a smaller total (from a process
+    that read the counter earlier) never overwrites a larger one.
+    """
+    totals = {
+        int(key.rsplit(':', 1)[1]): total
+        for key, total in cache.get_many([usage_key(tenant_id, period) for tenant_id in tenant_ids]).items()
+    }
+    by_alias = {}
+    for tenant_id in totals:
+        by_alias.setdefault(shard_for_tenant(tenant_id), []).append(tenant_id)
+    written = 0
+    for alias, ids in by_alias.items():
+        with transaction.atomic(using=alias):
+            subscriptions = list(
+                Subscription.objects.using(alias)
+                .select_for_update()
+                .filter(pk__in=Tenant.objects.using(alias).filter(pk__in=ids).values('active_subscription'))
+                .only('pk', 'tenant_id', 'current_usage')
+            )
+            changed = []
+            for subscription in subscriptions:
+                usage = subscription.current_usage or {}
+                total = totals[subscription.tenant_id]
+                if usage.get('api_calls_period') == period and usage.get('api_calls', 0) >= total:
+                    continue
+                subscription.current_usage = {**usage, 'api_calls': total, 'api_calls_period': period}
+                changed.append(subscription)
+            Subscription.objects.using(alias).bulk_update(changed, ['current_usage'])
+            written += len(changed)
+    return written
+
+
+class UsageMeter:
+    """Per-process API call buffer and the thread that flushes it."""
+
+    def __init__(self):
+        self._calls = deque()
+        self._unflushed = Counter()
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_persist = None
+
+    def record(self, tenant_id):
+        # deque.append is atomic, so request threads never wait on each other
+        self._calls.append(tenant_id)
+        if self._pid != os.getpid():
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            # Forked workers don't inherit the parent's thread
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._last_persist = time.monotonic()
+            thread = threading.Thread(target=self._run, name='api-usage-meter', daemon=True)
+            thread.start()
+            # Only processes that metered anything persist at exit
+            atexit.register(self.close)
+
+    def _run(self):
+        interval = getattr(settings, 'API_METERING_FLUSH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+                persist_interval = getattr(settings, 'API_METERING_PERSIST_INTERVAL', 60)
+                if time.monotonic() - self._last_persist >= persist_interval:
+                    self.persist()
+            except Exception:
+                logger.exception('Could not flush API usage')
+            finally:
+                # Connections opened by this thread would otherwise leak
+                connections.close_all()
+
+    def flush(self):
+        """Add the buffered calls to the shared counters. Returns the number of calls."""
+        with self._lock:
+            counts, self._unflushed = self._unflushed, Counter()
+        calls = self._calls
+        # popleft is atomic too; calls recorded meanwhile wait for the next flush
+        for _ in range(len(calls)):
+            counts[calls.popleft()] += 1
+        period = current_period()
+        flushed = 0
+        for tenant_id, count in counts.items():
+            try:
+                add_api_calls(tenant_id, count, period)
+            except Exception:
+                logger.exception('Could not add %d API calls of tenant %s', count, tenant_id)
+                with self._lock:
+                    self._unflushed[tenant_id] += count
+                continue
+            with self._lock:
+                self._seen.add((tenant_id, period))
+            flushed += count
+        return flushed
+
+    def persist(self):
+        """Persist the totals of the tenants flushed since the last persist."""
+        with self._lock:
+            seen, self._seen = self._seen, set()
+            self._last_persist = time.monotonic()
+        by_period = {}
+        for tenant_id, period in seen:
+            by_period.setdefault(period, []).append(tenant_id)
+        try:
+            return sum(persist_api_calls(ids, period) for period, ids in by_period.items())
+        except Exception:
+            # Retried with the next persist; writes are idempotent
+            with self._lock:
+                self._seen.update(seen)
+            raise
+
+    def close(self):
+        try:
+            self.flush()
+            self.persist()
+        except Exception:
+            logger.exception('Could not flush API usage')
+
+
+usage_meter = UsageMeter()
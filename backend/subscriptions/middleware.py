@@ -0,0 +1,56 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject, empty
+
+from accounts.authentication import ClaimsUser
+from subscription_management.caching import is_shared_cache
+from .metering import usage_meter
+
+
+logger = logging.getLogger(__name__)
+
+
+def request_tenant_id(request):
+    """
+    Tenant of the authenticated user of ``request``, without loading the
+    user: token users carry it in their claims, and Django's lazy session
+    user is only looked at once something else has evaluated it.
+    """
+    user = getattr(request, 'user', None)
+    if isinstance(user, ClaimsUser):
+        return user.tenant_id
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return None
+    return user.tenant_id if user.is_authenticated else None
+
+
+class ApiUsageMiddleware:
+    """
+    Meter the API calls of every tenant.
+
+    Off under ``manage.py test``, whose databases are gone by the time the
+    meter persists at exit, and without a shared cache, where each process
+    would count only its own calls.
+    """
+
+    def __init__(self, get_response):
+        if getattr(settings, 'TESTING', False):
+            raise MiddlewareNotUsed
+        if not is_shared_cache(cache):
+            logger.warning('API calls are not metered: the cache is local to each process; '
+                           "set CACHE_BACKEND to 'redis' to meter them.")
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # Authentication has run by now, inside the view; throttled calls
+        # don't count
+        if request.path.startswith('/api/') and response.status_code != 429:
+            tenant_id = request_tenant_id(request)
+            if tenant_id:
+                usage_meter.record(tenant_id)
+        return response
@@ -156,6 +156,8 @@ class Subscription(models.Model):
         ('trial', 'Trial'),
     ]
     
+    ACTIVE_STATUSES = ('active', 'trial')
+    
     tenant = models.ForeignKey(
         'tenants.Tenant',
         on_delete=models.CASCADE,
@@ -258,7 +260,7 @@ class Subscription(models.Model):
     @property
     def is_active(self):
         """Check if the subscription is currently active."""
-        return self.status in ['active', 'trial']
+        return self.status in self.ACTIVE_STATUSES
     
     @property
     def is_trial(self):
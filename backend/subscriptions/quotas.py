@@ -0,0 +1,221 @@
+"""
+API quotas from plan limits.
+
+``PlanQuotaThrottle`` answers 429 once a tenant has made its plan's
+``max_api_calls`` in the current metering month, or more calls than its
+burst limit within a sliding one-second window. The burst limit is the
+plan's ``metadata['api_burst_per_second']``, else ``API_QUOTA_BURST``;
+either limit is off when 0.
+
+Most calls are decided in process. The limits of each tenant's active plan
+sit in a per-process LRU in front of the shared cache and are invalidated
+when its subscriptions or plan change. The monthly total is the metering
+counter, re-read at most every ``API_QUOTA_SYNC_INTERVAL`` seconds, plus
+the calls this process has admitted since. Burst calls are admitted in
+leases of a tenth of the limit taken from a per-second counter in the
+shared cache, weighted against the previous second's, so a tenant costs a
+round trip per lease rather than per call; what is left of a lease is
+handed back when the second is over. A quota can thus be overshot by what
+other processes admit between syncs.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from tenants.models import Tenant
+from tenants.resolver import LocalLRUCache
+from tenants.sharding import all_shards, shard_for_tenant
+from .metering import api_calls, current_period
+from .models import Subscription
+
+
+# Stored in place of limits for tenants without an active subscription
+NO_PLAN = '__no_plan__'
+
+BURST_LEASES = 10
+
+
+def plan_limits_key(tenant_id):
+    return f'subscriptions:plan_limits:{tenant_id}'
+
+
+def burst_key(tenant_id, second):
+    return f'subscriptions:api_burst:{tenant_id}:{second}'
+
+
+def burst_default():
+    return getattr(settings, 'API_QUOTA_BURST', 50)
+
+
+class PlanLimitsCache:
+    """
+    Two-level cache of ``(max_api_calls, burst)`` per tenant, like the
+    tenant resolver's: a per-process LRU in front of the shared cache.
+    """
+
+    def __init__(self):
+        self.local = LocalLRUCache(
+            maxsize=getattr(settings, 'API_QUOTA_LOCAL_MAXSIZE', 1024),
+            timeout=getattr(settings, 'API_QUOTA_LOCAL_TIMEOUT', 5),
+        )
+
+    def get(self, tenant_id):
+        """Limits of ``tenant_id``'s active plan, or ``None`` without one."""
+        key = plan_limits_key(tenant_id)
+        value = self.local.get(key)
+        if value is None:
+            value = cache.get(key)
+            if value is None:
+                value = self._load(tenant_id)
+                cache.set(key, value, getattr(settings, 'API_QUOTA_LIMITS_TIMEOUT', 300))
+            self.local.set(key, value)
+        return None if value == NO_PLAN else value
+
+    def _load(self, tenant_id):
+        # The pointer is kept on the shard that holds the subscriptions
+        plan = (
+            Tenant.objects.using(shard_for_tenant(tenant_id))
+            .filter(pk=tenant_id, active_subscription__isnull=False)
+            .values_list('active_subscription__plan__max_api_calls',
+                         'active_subscription__plan__metadata')
+            .first()
+        )
+        if plan is None:
+            return NO_PLAN
+        max_api_calls, metadata = plan
+        return max_api_calls, (metadata or {}).get('api_burst_per_second', burst_default())
+
+    def invalidate(self, tenant_ids):
+        keys = [plan_limits_key(tenant_id) for tenant_id in tenant_ids if tenant_id]
+        if keys:
+            self.local.delete_many(keys)
+            cache.delete_many(keys)
+
+    def invalidate_plan(self, plan_id):
+        """Invalidate every tenant subscribed to ``plan_id``."""
+        for alias in all_shards():
+            self.invalidate(
+                Subscription.objects.using(alias)
+                .filter(plan_id=plan_id, status__in=Subscription.ACTIVE_STATUSES)
+                .values_list('tenant_id', flat=True)
+                .distinct()
+            )
+
+
+plan_limits = PlanLimitsCache()
+
+
+class QuotaTracker:
+    """Per-process view of every tenant's monthly and burst quota."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # tenant id -> [period, synced_at, shared total, calls admitted since]
+        self._monthly = {}
+        # tenant id -> [second, previous second's count, calls left in lease]
+        self._burst = {}
+
+    def allow_monthly(self, tenant_id, limit):
+        period = current_period()
+        with self._lock:
+            state = self._monthly.get(tenant_id)
+        sync_interval = getattr(settings, 'API_QUOTA_SYNC_INTERVAL', 1)
+        if state is None or state[0] != period or time.monotonic() - state[1] >= sync_interval:
+            state = [period, time.monotonic(), api_calls(tenant_id, period), 0]
+        with self._lock:
+            if state[2] + state[3] >= limit:
+                allowed = False
+            else:
+                state[3] += 1
+                allowed = True
+            self._monthly[tenant_id] = state
+        return allowed
+
+    def allow_burst(self, tenant_id, limit):
+        now = time.time()
+        second = int(now)
+        with self._lock:
+            state = self._burst.get(tenant_id)
+            if state is not None and state[0] == second and state[2] > 0:
+                state[2] -= 1
+                return True
+        if state is None or state[0] != second:
+            if state is not None and state[2] > 0 and state[0] >= second - 1:
+                # Hand back what is left of the last lease while it still
+                # counts against the window
+                try:
+                    cache.decr(burst_key(tenant_id, state[0]), state[2])
+                except ValueError:
+                    pass
+            # The previous second is complete, so it is read once
+            state = [second, cache.get(burst_key(tenant_id, second - 1), 0), 0]
+
+        lease = max(1, limit // BURST_LEASES)
+        key = burst_key(tenant_id, second)
+        try:
+            count = cache.incr(key, lease)
+        except ValueError:
+            count = lease if cache.add(key, lease, 5) else cache.incr(key, lease)
+        # Sliding window: the previous second weighted by its overlap
+        admitted = state[1] * (1 - (now - second)) + count - lease
+        allowance = min(lease, math.floor(limit - admitted))
+        if allowance < 1:
+            # Rejected calls don't count against the window
+            try:
+                cache.decr(key, lease)
+            except ValueError:
+                pass
+            allowed = False
+        else:
+            state[2] = allowance - 1
+            allowed = True
+        with self._lock:
+            self._burst[tenant_id] = state
+        return allowed
+
+
+quota_tracker = QuotaTracker()
+
+
+def seconds_until_next_period():
+    now = timezone.now().astimezone(dt_timezone.utc)
+    year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+    return (datetime(year, month, 1, tzinfo=dt_timezone.utc) - now).total_seconds()
+
+
+class PlanQuotaThrottle(BaseThrottle):
+    """
+    Throttle tenant users by their plan's monthly API calls and burst limit.
+
+    Views that must stay reachable when the monthly quota is spent, such as
+    the ones changing the plan, set ``api_quota_exempt = True``; the burst
+    limit still applies to them.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        tenant_id = getattr(request.user, 'tenant_id', None)
+        if not tenant_id:
+            return True
+        limits = plan_limits.get(tenant_id)
+        max_api_calls, burst = limits if limits is not None else (None, burst_default())
+        if burst and not quota_tracker.allow_burst(tenant_id, burst):
+            self.wait_seconds = 1
+            return False
+        if (
+            max_api_calls
+            and not getattr(view, 'api_quota_exempt', False)
+            and not quota_tracker.allow_monthly(tenant_id, max_api_calls)
+        ):
+            self.wait_seconds = seconds_until_next_period()
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
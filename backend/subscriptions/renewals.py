@@ -0,0 +1,131 @@
+"""
+Subscription renewals.
+
+Due subscriptions, active or trialing with ``current_period_end`` in the
+past, are claimed in batches through the ``current_period_end`` index with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of workers can renew
+the same database in parallel: each batch skips the rows another worker
+holds and commits on its own. A claimed subscription either moves on by one
+period of its plan's billing cycle and gets an open invoice for it, or is
+cancelled when it was set to cancel at the period end. A subscription
+several periods behind is renewed once per period, by later batches of the
+same run.
+
+With schema isolation the subscriptions of each tenant live in its own
+schema, so every tenant of a shard is renewed in turn inside its schema.
+
+SQLite has no ``FOR UPDATE``; run a single renewal worker against it.
+"""
+import logging
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from billing.invoices import build_subscription_invoice, next_period_end
+from billing.models import Invoice
+from tenants.models import Tenant
+from tenants.schemas import schema_isolation_enabled
+from tenants.sharding import all_shards, shard_for_tenant, tenant_context
+from .models import Subscription
+from .quotas import plan_limits
+from .signals import sync_active_subscription
+
+
+logger = logging.getLogger(__name__)
+
+RENEWED_FIELDS = ['status', 'current_period_start', 'current_period_end', 'cancelled_at']
+
+
+def renew_batch(alias, now, batch_size):
+    """
+    Claim and renew up to ``batch_size`` subscriptions of ``alias`` due at
+    ``now``. Returns ``(renewed, cancelled)``; both are 0 when none is left.
+    """
+    with transaction.atomic(using=alias):
+        due = list(
+            Subscription.objects.using(alias)
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(status__in=Subscription.ACTIVE_STATUSES, current_period_end__lte=now)
+            .select_related('plan')
+            .order_by('current_period_end')[:batch_size]
+        )
+        invoices = []
+        cancelled_tenants = set()
+        # Subscriptions ending together share their new values, so they are
+        # updated together; at the start of a month that is most of them
+        updates = defaultdict(list)
+        for subscription in due:
+            if subscription.cancel_at_period_end:
+                subscription.status = 'cancelled'
+                subscription.cancelled_at = now
+                cancelled_tenants.add(subscription.tenant_id)
+            else:
+                period_start = subscription.current_period_end
+                period_end = next_period_end(period_start, subscription.plan.billing_cycle)
+                invoices.append(build_subscription_invoice(subscription, period_start, period_end, now))
+                subscription.current_period_start = period_start
+                subscription.current_period_end = period_end
+                # A trial that has run out becomes a paid subscription
+                subscription.status = 'active'
+            values = tuple(getattr(subscription, field) for field in RENEWED_FIELDS)
+            updates[values].append(subscription.pk)
+        for values, ids in updates.items():
+            Subscription.objects.using(alias).filter(pk__in=ids).update(
+                updated_at=now, **dict(zip(RENEWED_FIELDS, values))
+            )
+        Invoice.objects.using(alias).bulk_create(invoices)
+        # update() skips the receivers keeping these in sync
+        for tenant_id in cancelled_tenants:
+            sync_active_subscription(tenant_id, alias)
+        if cancelled_tenants:
+            transaction.on_commit(lambda: plan_limits.invalidate(cancelled_tenants), using=alias)
+    return len(invoices), len(due) - len(invoices)
+
+
+def _scopes(alias):
+    """Contexts to renew ``alias`` in: the shard itself, or each tenant schema on it."""
+    if not schema_isolation_enabled():
+        return [nullcontext()]
+    return [
+        tenant_context(tenant_id)
+        for tenant_id in Tenant.objects.order_by('pk').values_list('pk', flat=True)
+        if shard_for_tenant(tenant_id) == alias
+    ]
+
+
+def renew_subscriptions(batch_size=None, max_batches=None, aliases=None):
+    """
+    Renew every subscription due now on ``aliases`` (default: all shards).
+    Returns throughput metrics.
+    """
+    batch_size = batch_size or getattr(settings, 'SUBSCRIPTION_RENEWAL_BATCH_SIZE', 500)
+    now = timezone.now()
+    renewed = cancelled = batches = 0
+    started = time.perf_counter()
+    for alias in aliases or all_shards():
+        for scope in _scopes(alias):
+            with scope:
+                while max_batches is None or batches < max_batches:
+                    batch_renewed, batch_cancelled = renew_batch(alias, now, batch_size)
+                    if not batch_renewed and not batch_cancelled:
+                        break
+                    renewed += batch_renewed
+                    cancelled += batch_cancelled
+                    batches += 1
+    elapsed = time.perf_counter() - started
+    metrics = {
+        'renewed': renewed,
+        'cancelled': cancelled,
+        'batches': batches,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round((renewed + cancelled) / elapsed) if elapsed else 0,
+    }
+    logger.info(
+        'Renewed %(renewed)d and cancelled %(cancelled)d subscriptions in %(batches)d batches '
+        '(%(seconds).3fs, %(rows_per_second)d rows/s)', metrics
+    )
+    return metrics
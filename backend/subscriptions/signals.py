@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from tenants.models import Tenant
+from tenants.offboarding import is_offboarding
+from .catalog import plan_catalog
+from .models import Plan, Subscription
+from .quotas import plan_limits
+
+
+def sync_active_subscription(tenant_id, using):
+    """
+    Point the tenant at its newest active subscription, on the database that
+    holds its subscriptions.
+    """
+    with transaction.atomic(using=using):
+        # Lock the tenant so concurrent transitions apply one at a time
+        tenants = Tenant.objects.using(using).filter(pk=tenant_id)
+        list(tenants.select_for_update().values_list('pk', flat=True))
+        active_id = (
+            Subscription.objects.using(using)
+            .filter(tenant_id=tenant_id, status__in=Subscription.ACTIVE_STATUSES)
+            .order_by('-created_at', '-pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        tenants.update(active_subscription_id=active_id)
+
+
+@receiver(post_init, sender=Subscription)
+def remember_subscription_state(sender, instance, **kwargs):
+    # Skip deferred fields rather than fetching them
+    if 'status' in instance.__dict__ and 'tenant_id' in instance.__dict__:
+        instance._original_state = (instance.tenant_id, instance.status)
+
+
+@receiver(post_save, sender=Subscription)
+def update_active_subscription(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    original = getattr(instance, '_original_state', None)
+    if created or original != (instance.tenant_id, instance.status):
+        sync_active_subscription(instance.tenant_id, using)
+        if original and original[0] != instance.tenant_id:
+            sync_active_subscription(original[0], using)
+    instance._original_state = (instance.tenant_id, instance.status)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_active_subscription(sender, instance, using=None, **kwargs):
+    if is_offboarding():
+        return
+    sync_active_subscription(instance.tenant_id, using)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_plan_limits(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        tenant_ids = [instance.tenant_id]
+        original = getattr(instance, '_original_state', None)
+        if original:
+            tenant_ids.append(original[0])
+        transaction.on_commit(lambda: plan_limits.invalidate(tenant_ids), using=using)
+
+
+@receiver(post_save, sender=Plan)
+def invalidate_plan_catalog(sender, instance, raw=False, using=None, **kwargs):
+    # Replicas are saved raw; the original save already invalidated it
+    if not raw:
+        transaction.on_commit(plan_catalog.invalidate, using=using)
+        transaction.on_commit(lambda: plan_limits.invalidate_plan(instance.pk), using=using)
+
+
+@receiver(post_delete, sender=Plan)
+def invalidate_plan_catalog_on_delete(sender, instance, using=None, **kwargs):
+    transaction.on_commit(plan_catalog.invalidate, using=using)
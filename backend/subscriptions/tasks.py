@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .renewals import renew_subscriptions
+
+
+@shared_task
+def renew_due_subscriptions():
+    """Periodic run renewing subscriptions whose period has ended."""
+    return renew_subscriptions()
@@ -1,8 +1,15 @@
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
 from rest_framework import generics, permissions, views
 from rest_framework.response import Response
+from .catalog import plan_catalog
+from .metering import api_calls
 from .models import Plan, Subscription
 from .serializers import PlanSerializer, SubscriptionSerializer
-from accounts.permissions import IsTenantAdminOrReadOnly, IsSystemAdmin
+from accounts.permissions import IsTenantAdminOrReadOnly, IsSystemAdmin, PermissionQuerysetMixin
+from subscription_management.conditional import ConditionalGetMixin, apply_validator_headers
+from tenants.models import Tenant
+from tenants.sharding import shard_for_tenant
 
 
 class PlanListView(generics.ListCreateAPIView):
@@ -11,14 +18,28 @@ class PlanListView(generics.ListCreateAPIView):
     """
     queryset = Plan.objects.filter(is_active=True)
     serializer_class = PlanSerializer
+    api_quota_exempt = True
     
     def get_permissions(self):
         if self.request.method == 'POST':
             return [permissions.IsAuthenticated(), IsSystemAdmin()]
         return [permissions.IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        # The unfiltered first page in JSON is served from the cached catalog
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        etag, content = plan_catalog.get()
+        if content is None:
+            return super().list(request, *args, **kwargs)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return apply_validator_headers(not_modified, {'ETag': etag})
+        response = HttpResponse(content, content_type='application/json')
+        return apply_validator_headers(response, {'ETag': etag})
 
-class PlanDetailView(generics.RetrieveUpdateDestroyAPIView):
+
+class PlanDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update and delete plan (Admin only for update/delete).
     """
@@ -37,14 +58,19 @@ class SubscriptionListView(generics.ListCreateAPIView):
     """
     serializer_class = SubscriptionSerializer
     permission_classes = [permissions.IsAuthenticated, IsTenantAdminOrReadOnly]
+    query_budget = 4
+    # Reachable to upgrade once the monthly API quota is spent
+    api_quota_exempt = True
     
     def get_queryset(self):
         user = self.request.user
         if user.is_admin:
-            return Subscription.objects.all()
-        elif user.tenant:
-            return Subscription.objects.filter(tenant=user.tenant)
-        return Subscription.objects.none()
+            subscriptions = Subscription.objects.all()
+        elif user.tenant_id:
+            subscriptions = Subscription.objects.filter(tenant_id=user.tenant_id)
+        else:
+            return Subscription.objects.none()
+        return subscriptions.select_related('plan', 'tenant')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -52,24 +78,33 @@ class SubscriptionListView(generics.ListCreateAPIView):
         return context
 
 
-class SubscriptionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class SubscriptionDetailView(ConditionalGetMixin, PermissionQuerysetMixin,
+                             generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update and delete subscription.
     """
     serializer_class = SubscriptionSerializer
     permission_classes = [permissions.IsAuthenticated, IsTenantAdminOrReadOnly]
+    query_budget = 4
+    # Reachable to upgrade once the monthly API quota is spent
+    api_quota_exempt = True
+    # Metering writes current_usage without touching updated_at
+    etag_fields = ('updated_at', 'plan__updated_at', 'tenant__name', 'current_usage')
     
     def get_queryset(self):
         user = self.request.user
         if user.is_admin:
-            return Subscription.objects.all()
-        elif user.tenant:
-            return Subscription.objects.filter(tenant=user.tenant)
-        return Subscription.objects.none()
+            subscriptions = Subscription.objects.all()
+        elif user.tenant_id:
+            subscriptions = Subscription.objects.filter(tenant_id=user.tenant_id)
+        else:
+            return Subscription.objects.none()
+        return subscriptions.select_related('plan', 'tenant')
 
 
 class UsageView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
+    api_quota_exempt = True
 
     def get(self, request):
         tenant = request.user.tenant
@@ -77,8 +112,16 @@ class UsageView(views.APIView):
             return Response({
                 'error': 'No tenant associated'
             }, status=400)
+        # The pointer is kept on the shard that holds the subscriptions
+        tenant = (
+            Tenant.objects.using(shard_for_tenant(tenant.pk))
+            .with_active_plan()
+            .get(pk=tenant.pk)
+        )
         subscription = tenant.active_subscription
         usage = subscription.current_usage if subscription else {'users': tenant.user_count, 'storage_gb': 0, 'api_calls': 0}
+        # The persisted count lags behind the metering counters
+        usage = {**usage, 'api_calls': api_calls(tenant.pk)}
         limits = {
             'max_users': subscription.plan.max_users if subscription else 0,
             'max_storage_gb': subscription.plan.max_storage_gb if subscription else 0,
@@ -1,5 +1,48 @@
 from django.contrib import admin
-from .models import Tenant, Domain, TenantInvitation
+from .models import Tenant, Domain, TenantInvitation, TenantOffboarding
+from .sharding import all_shards, is_sharded
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    title = 'shard'
+    parameter_name = 'shard'
+    
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in all_shards()]
+    
+    def queryset(self, request, queryset):
+        if self.value() in all_shards():
+            return queryset.using(self.value())
+        return queryset
+
+
+class ShardedAdminMixin:
+    """
+    Admin mixin for tenant-owned models: the changelist browses one shard at
+    a time and change views find objects on any shard.
+    """
+    
+    def get_list_filter(self, request):
+        list_filter = tuple(super().get_list_filter(request))
+        if is_sharded():
+            return (ShardListFilter,) + list_filter
+        return list_filter
+    
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None or not is_sharded():
+            return obj
+        queryset = self.get_queryset(request)
+        field = queryset.model._meta.pk if from_field is None else queryset.model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+        except Exception:
+            return None
+        for alias in all_shards():
+            obj = queryset.using(alias).filter(**{field.name: object_id}).first()
+            if obj is not None:
+                return obj
+        return None
 
 
 class DomainInline(admin.TabularInline):
@@ -19,6 +62,7 @@ class TenantAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'created_at')
     search_fields = ('name', 'description', 'contact_email')
     prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('user_count',)
     inlines = [DomainInline, TenantInvitationInline]
     
     fieldsets = (
@@ -34,7 +78,17 @@ class TenantAdmin(admin.ModelAdmin):
         ('Settings', {
             'fields': ('settings', 'metadata')
         }),
+        ('Usage', {
+            'fields': ('user_count',)
+        }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        if change:
+            # The counters may have moved since the form was loaded
+            obj.save(update_fields=[*form.changed_data, 'updated_at'])
+        else:
+            obj.save()
 
 
 @admin.register(Domain)
@@ -49,4 +103,15 @@ class TenantInvitationAdmin(admin.ModelAdmin):
     list_display = ('email', 'tenant', 'role', 'status', 'invited_by', 'expires_at')
     list_filter = ('status', 'role', 'tenant')
     search_fields = ('email', 'tenant__name')
-    readonly_fields = ('token', 'expires_at', 'accepted_at') 
\ No newline at end of file
+    readonly_fields = ('token', 'expires_at', 'accepted_at') 
+
+
+@admin.register(TenantOffboarding)
+class TenantOffboardingAdmin(admin.ModelAdmin):
+    list_display = ('tenant_name', 'tenant_id', 'status', 'current_step', 'created_at', 'completed_at')
+    list_filter = ('status',)
+    search_fields = ('tenant_name',)
+    readonly_fields = (
+        'tenant_id', 'tenant_name', 'requested_by', 'status', 'current_step',
+        'completed_steps', 'deleted_counts', 'error', 'started_at', 'completed_at'
+    )
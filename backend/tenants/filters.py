@@ -0,0 +1,76 @@
+import json
+
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import Exact, IsNull
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .json_indexes import JSON_FIELDS, indexed_columns, parse_key
+
+
+def parse_value(raw):
+    """Read a query parameter as a JSON literal, or as a plain string."""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+class TenantJSONFilterBackend(BaseFilterBackend):
+    """
+    Filter tenants on keys of their ``settings`` and ``metadata``, e.g.
+    ``?settings.features.beta=true&metadata.segment=enterprise``.
+
+    PostgreSQL answers all predicates with one containment lookup per field,
+    served by the GIN indexes. Elsewhere keys configured in
+    ``TENANT_JSON_INDEXED_KEYS`` use their indexed generated column and the
+    rest fall back to key lookups.
+    """
+
+    def _predicates(self, request):
+        predicates = []
+        for key, raw in request.query_params.items():
+            if key.partition('.')[0] not in JSON_FIELDS:
+                continue
+            try:
+                field, path = parse_key(key)
+            except ValueError:
+                raise ValidationError({key: 'Invalid JSON key.'})
+            predicates.append((field, path, parse_value(raw)))
+        return predicates
+
+    def filter_queryset(self, request, queryset, view):
+        predicates = self._predicates(request)
+        if not predicates:
+            return queryset
+
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            documents = {}
+            for field, path, value in predicates:
+                node = documents.setdefault(field, {})
+                for part in path[:-1]:
+                    node = node.setdefault(part, {})
+                node[path[-1]] = value
+            return queryset.filter(**{
+                f'{field}__contains': document for field, document in documents.items()
+            })
+
+        columns = indexed_columns()
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        for field, path, value in predicates:
+            column = columns.get((field, tuple(path)))
+            if column is None or isinstance(value, (dict, list)):
+                queryset = queryset.filter(**{'__'.join([field, *path]): value})
+                continue
+            # json_extract() yields SQL scalars: booleans become 0/1
+            extracted = RawSQL(f'{table}.{connection.ops.quote_name(column)}', (),
+                               output_field=models.Field())
+            if value is None:
+                queryset = queryset.filter(IsNull(extracted, True))
+            else:
+                queryset = queryset.filter(Exact(
+                    extracted, int(value) if isinstance(value, bool) else value
+                ))
+        return queryset
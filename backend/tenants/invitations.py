@@ -0,0 +1,135 @@
+"""
+Bulk tenant invitations.
+
+Emails are normalized and de-duplicated in memory, checked against existing
+members and pending invitations with one query per batch, and inserted with
+``bulk_create``. Delivery is handed to ``send_invitation_emails`` once the
+rows are committed, one task (and one mail connection) per batch.
+"""
+import logging
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from accounts.models import User
+from .models import TenantInvitation
+
+
+logger = logging.getLogger(__name__)
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _batch_size():
+    return getattr(settings, 'TENANT_INVITATION_BATCH_SIZE', 500)
+
+
+def normalize_emails(emails):
+    """Lowercase and de-duplicate ``emails``, keeping their order."""
+    return list(dict.fromkeys(email.strip().lower() for email in emails))
+
+
+def _existing_emails(tenant, emails):
+    """
+    Emails that already belong to a member or have a pending invitation,
+    ignoring case: stored addresses may keep the case they were entered in.
+    """
+    existing = set()
+    for batch in _batches(emails, _batch_size()):
+        existing.update(
+            User.objects.using('default')
+            .alias(email_lower=Lower('email'))
+            .filter(email_lower__in=batch)
+            .values_list(Lower('email'), flat=True)
+        )
+        existing.update(
+            TenantInvitation.objects
+            .alias(email_lower=Lower('email'))
+            .filter(tenant=tenant, status='pending', email_lower__in=batch)
+            .values_list(Lower('email'), flat=True)
+        )
+    return existing
+
+
+def create_invitations(tenant, emails, role, invited_by):
+    """
+    Invite ``emails`` to ``tenant`` and queue the emails for delivery.
+
+    Returns ``(invitations, skipped)`` where ``skipped`` lists the emails
+    that already had an account or a pending invitation.
+    """
+    from .tasks import send_invitation_emails
+
+    emails = normalize_emails(emails)
+    existing = _existing_emails(tenant, emails)
+    expires_at = timezone.now() + timedelta(
+        days=getattr(settings, 'TENANT_INVITATION_EXPIRY_DAYS', 7)
+    )
+    invitations = [
+        TenantInvitation(
+            tenant=tenant,
+            email=email,
+            role=role,
+            invited_by=invited_by,
+            token=secrets.token_urlsafe(32),
+            expires_at=expires_at,
+        )
+        for email in emails if email not in existing
+    ]
+
+    batch_size = _batch_size()
+    with transaction.atomic():
+        TenantInvitation.objects.bulk_create(invitations, batch_size=batch_size)
+        # PostgreSQL and SQLite set the new ids on the instances
+        for batch in _batches(invitations, batch_size):
+            ids = [invitation.pk for invitation in batch]
+            transaction.on_commit(lambda ids=ids: send_invitation_emails.delay(ids))
+
+    skipped = [email for email in emails if email in existing]
+    return invitations, skipped
+
+
+def invitation_url(invitation):
+    return f"{settings.FRONTEND_URL.rstrip('/')}/invitations/{invitation.token}"
+
+
+def expire_invitations(batch_size=None, max_batches=None):
+    """
+    Move pending invitations past their expiry date to ``'expired'``.
+
+    Each batch picks the oldest ids through the ``(status, expires_at)``
+    index and updates them in its own short statement, so the sweep never
+    scans the table or holds locks for long. Returns throughput metrics.
+    """
+    batch_size = batch_size or getattr(settings, 'TENANT_INVITATION_EXPIRE_BATCH_SIZE', 1000)
+    now = timezone.now()
+    stale = TenantInvitation.objects.filter(status='pending', expires_at__lte=now)
+    expired = batches = 0
+    started = time.perf_counter()
+    while max_batches is None or batches < max_batches:
+        ids = list(stale.order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        # Re-check the status in case an invitation was accepted meanwhile
+        expired += stale.filter(pk__in=ids).update(status='expired', updated_at=now)
+        batches += 1
+    elapsed = time.perf_counter() - started
+    metrics = {
+        'expired': expired,
+        'batches': batches,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(expired / elapsed) if elapsed else 0,
+    }
+    logger.info(
+        'Expired %(expired)d invitations in %(batches)d batches '
+        '(%(seconds).3fs, %(rows_per_second)d rows/s)', metrics
+    )
+    return metrics
@@ -0,0 +1,84 @@
+"""
+Indexes for key/value predicates on ``Tenant.settings`` and ``Tenant.metadata``.
+
+On PostgreSQL both columns carry a GIN ``jsonb_path_ops`` index (migration
+0006) that serves containment (``@>``) lookups for any key. SQLite has no
+equivalent, so the hot keys listed in ``TENANT_JSON_INDEXED_KEYS`` (e.g.
+``'settings.features.beta'``) are extracted into indexed virtual generated
+columns instead. Those columns are not part of the model; they are synced
+after every ``migrate`` because SQLite table rebuilds drop them.
+"""
+import re
+
+from django.conf import settings
+
+from .models import Tenant
+
+
+JSON_FIELDS = ('settings', 'metadata')
+
+COLUMN_PREFIX = 'json_'
+
+KEY_PART = re.compile(r'^[\w-]+$')
+
+
+def parse_key(key):
+    """Split ``'settings.a.b'`` into ``('settings', ['a', 'b'])``."""
+    field, _, path = key.partition('.')
+    parts = path.split('.')
+    if field not in JSON_FIELDS or not all(KEY_PART.match(part) for part in parts):
+        raise ValueError(f'Invalid tenant JSON key: {key!r}')
+    return field, parts
+
+
+def key_column(field, path):
+    """Name of the generated column holding ``field`` at ``path``."""
+    slug = re.sub(r'\W+', '_', '_'.join([field, *path])).strip('_').lower()
+    return f'{COLUMN_PREFIX}{slug}'
+
+
+def indexed_keys():
+    return [parse_key(key) for key in getattr(settings, 'TENANT_JSON_INDEXED_KEYS', [])]
+
+
+def indexed_columns():
+    """Generated column names by ``(field, tuple(path))`` for the configured keys."""
+    return {(field, tuple(path)): key_column(field, path) for field, path in indexed_keys()}
+
+
+def _json_path(path):
+    return '$' + ''.join(f'."{part}"' for part in path)
+
+
+def sync_json_key_columns(connection):
+    """
+    Create the generated columns and indexes for the configured keys on a
+    SQLite database and drop the ones no longer configured. Returns the
+    ``(created, dropped)`` column names.
+    """
+    if connection.vendor != 'sqlite':
+        return [], []
+    table = Tenant._meta.db_table
+    qn = connection.ops.quote_name
+    wanted = {column: (field, path) for (field, path), column in indexed_columns().items()}
+    with connection.cursor() as cursor:
+        # table_info leaves generated columns out; table_xinfo lists them
+        cursor.execute(f'PRAGMA table_xinfo({qn(table)})')
+        existing = {row[1] for row in cursor.fetchall() if row[1].startswith(COLUMN_PREFIX)}
+        created = [column for column in wanted if column not in existing]
+        dropped = [column for column in existing if column not in wanted]
+        for column in dropped:
+            cursor.execute(f'DROP INDEX IF EXISTS {qn(table + "_" + column + "_idx")}')
+            cursor.execute(f'ALTER TABLE {qn(table)} DROP COLUMN {qn(column)}')
+        for column in created:
+            field, path = wanted[column]
+            cursor.execute(
+                f'ALTER TABLE {qn(table)} ADD COLUMN {qn(column)} '
+                f"GENERATED ALWAYS AS (json_extract({qn(field)}, '{_json_path(path)}')) VIRTUAL"
+            )
+        for column in wanted:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {qn(table + "_" + column + "_idx")} '
+                f'ON {qn(table)} ({qn(column)})'
+            )
+    return created, dropped
@@ -0,0 +1,112 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from tenants.models import Tenant, Domain
+from tenants.resolver import (
+    lookup_tenants,
+    resolve_tenant,
+    tenant_resolver_cache,
+    domain_cache_key,
+    subdomain_cache_key,
+    header_cache_key,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_cascade(host, subdomain, tenant_id):
+    """The domain -> subdomain -> header cascade TenantMiddleware used to run."""
+    try:
+        return Domain.objects.get(domain=host, is_active=True).tenant
+    except Domain.DoesNotExist:
+        pass
+    if subdomain:
+        try:
+            return Tenant.objects.get(slug=subdomain, is_active=True)
+        except Tenant.DoesNotExist:
+            pass
+    if tenant_id:
+        try:
+            return Tenant.objects.get(id=tenant_id, is_active=True)
+        except Tenant.DoesNotExist:
+            pass
+    return None
+
+
+def single_query(host, subdomain, tenant_id):
+    tenants = lookup_tenants(host=host, subdomain=subdomain, tenant_id=tenant_id)
+    return next((tenant for tenant in tenants if tenant is not None), None)
+
+
+class Command(BaseCommand):
+    help = 'Compares round trips and latency of the tenant lookup strategies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=200,
+                            help='Number of throwaway tenants to create.')
+        parser.add_argument('--iterations', type=int, default=500,
+                            help='Resolutions per scenario and strategy.')
+
+    def handle(self, *args, **options):
+        scenarios = []
+        try:
+            with transaction.atomic():
+                scenarios = self._create_fixtures(options['tenants'])
+                self._run(scenarios, options['iterations'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            # The fixtures are rolled back, so drop whatever got cached for them
+            keys = []
+            for _, host, subdomain, tenant_id in scenarios:
+                keys.append(domain_cache_key(host))
+                if subdomain:
+                    keys.append(subdomain_cache_key(subdomain))
+                if tenant_id:
+                    keys.append(header_cache_key(tenant_id))
+            tenant_resolver_cache.invalidate(keys)
+
+    def _create_fixtures(self, count):
+        tenants = Tenant.objects.bulk_create([
+            Tenant(name=f'Benchmark Tenant {i}', slug=f'bench-{i}')
+            for i in range(count)
+        ])
+        Domain.objects.bulk_create([
+            Domain(tenant=tenant, domain=f'portal-{i}.bench.test', is_primary=True)
+            for i, tenant in enumerate(tenants)
+        ])
+        middle = count // 2
+        return [
+            ('domain', f'portal-{middle}.bench.test', f'portal-{middle}', None),
+            ('subdomain', f'bench-{middle}.example.com', f'bench-{middle}', None),
+            ('header', 'localhost', None, tenants[middle].pk),
+            ('miss', 'unknown.example.com', 'unknown', 10 ** 12),
+        ]
+
+    def _run(self, scenarios, iterations):
+        strategies = [
+            ('cascade', legacy_cascade),
+            ('single', single_query),
+            ('cached', lambda *args: resolve_tenant(*args)),
+        ]
+        self.stdout.write(f"{'scenario':<10} {'strategy':<8} {'queries':>8} {'mean us':>10}")
+        for name, host, subdomain, tenant_id in scenarios:
+            args = (host, subdomain, tenant_id)
+            for strategy, resolve in strategies:
+                # Warm up once so the cached strategy measures its hit path
+                resolve(*args)
+                with CaptureQueriesContext(connection) as queries:
+                    resolve(*args)
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    resolve(*args)
+                mean_us = (time.perf_counter() - started) / iterations * 1e6
+                self.stdout.write(
+                    f'{name:<10} {strategy:<8} {len(queries):>8} {mean_us:>10.1f}'
+                )
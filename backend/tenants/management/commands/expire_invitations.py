@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tenants.invitations import expire_invitations
+
+
+class Command(BaseCommand):
+    help = 'Marks pending tenant invitations past their expiry date as expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows per update (default: TENANT_INVITATION_EXPIRE_BATCH_SIZE).')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches.')
+
+    def handle(self, *args, **options):
+        metrics = expire_invitations(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {metrics['expired']} invitation(s) in {metrics['batches']} batch(es) "
+            f"({metrics['seconds']}s, {metrics['rows_per_second']} rows/s)."
+        ))
@@ -0,0 +1,40 @@
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tenants.export import EXPORT_FORMATS, EXPORT_RECORD_TYPES, stream_tenant_export
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = "Streams a tenant's data as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Tenant id or slug.')
+        parser.add_argument('--output-format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output.')
+        parser.add_argument('--types', nargs='+', choices=list(EXPORT_RECORD_TYPES),
+                            help='Record types to export (default: all).')
+        parser.add_argument('--file', help='Write to this path instead of stdout.')
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['tenant']} if options['tenant'].isdigit() else {'slug': options['tenant']}
+        try:
+            tenant = Tenant.objects.get(**lookup)
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']} does not exist")
+
+        chunks = stream_tenant_export(
+            tenant.pk, options['output_format'], options['gzip'], options['types']
+        )
+        written = 0
+        with (open(options['file'], 'wb') if options['file'] else nullcontext(sys.stdout.buffer)) as out:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+
+        if options['file']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Exported {tenant.name} to {options['file']} ({written} bytes)."
+            ))
@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from django.apps import apps
+
+from tenants.routers import TENANT_OWNED_MODELS
+from tenants.sharding import all_shards, reserve_shard_id_range
+
+
+class Command(BaseCommand):
+    help = 'Runs migrations on the default database and every tenant shard'
+
+    def handle(self, *args, **options):
+        for alias in all_shards():
+            self.stdout.write(f'Migrating {alias}...')
+            call_command('migrate', database=alias, interactive=False,
+                         verbosity=options['verbosity'])
+            reserve_shard_id_range(alias, [apps.get_model(label) for label in TENANT_OWNED_MODELS])
+        self.stdout.write(self.style.SUCCESS(f'Migrated {len(all_shards())} database(s).'))
@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from tenants.models import Tenant
+from tenants.schemas import (
+    check_schema_isolation,
+    create_schema,
+    schema_isolation_enabled,
+    schema_name_for,
+    set_search_path,
+    set_migrating_schema,
+    reset_migrating_schema,
+)
+from tenants.sharding import shard_for_tenant
+
+
+class Command(BaseCommand):
+    help = 'Creates and migrates the PostgreSQL schema of every tenant in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, action='append', dest='tenant_ids',
+                            help='Only migrate these tenant ids (repeatable).')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Number of schemas migrated concurrently, each in its own process.')
+        parser.add_argument('--skip-shared', action='store_true',
+                            help='Do not migrate the shared tables first.')
+
+    def handle(self, *args, **options):
+        if not schema_isolation_enabled():
+            raise CommandError("TENANT_ISOLATION_MODE is not 'schema'.")
+        check_schema_isolation()
+
+        # Shared tables first, so tenant runs find content types and permissions
+        if not options['skip_shared']:
+            call_command('migrate', interactive=False, verbosity=options['verbosity'])
+
+        tenants = Tenant.objects.order_by('id')
+        if options['tenant_ids']:
+            tenants = tenants.filter(id__in=options['tenant_ids'])
+        tenant_ids = list(tenants.values_list('id', flat=True))
+
+        workers = max(1, options['workers'])
+        if workers > 1 and len(tenant_ids) > 1:
+            failed = self._migrate_in_processes(tenant_ids, workers)
+        else:
+            failed = self._migrate_in_process(tenant_ids)
+
+        if failed:
+            raise CommandError(f'{failed} of {len(tenant_ids)} schema(s) failed to migrate.')
+        self.stdout.write(self.style.SUCCESS(f'Migrated {len(tenant_ids)} tenant schema(s).'))
+
+    def _migrate_in_process(self, tenant_ids):
+        failed = 0
+        for tenant_id in tenant_ids:
+            schema = schema_name_for(tenant_id)
+            try:
+                self._migrate_schema(tenant_id)
+                self.stdout.write(f'Migrated {schema}')
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Failed to migrate {schema}: {e}'))
+        return failed
+
+    def _migrate_in_processes(self, tenant_ids, workers):
+        # The migration executor is not thread-safe, so each schema is
+        # migrated by a child process; the threads only wait on them
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._run_child, tenant_id): tenant_id
+                for tenant_id in tenant_ids
+            }
+            for future in as_completed(futures):
+                schema = schema_name_for(futures[future])
+                result = future.result()
+                if result.returncode == 0:
+                    self.stdout.write(f'Migrated {schema}')
+                else:
+                    failed += 1
+                    error = (result.stderr.strip().splitlines() or ['exit code %d' % result.returncode])[-1]
+                    self.stdout.write(self.style.ERROR(f'Failed to migrate {schema}: {error}'))
+        return failed
+
+    def _run_child(self, tenant_id):
+        return subprocess.run(
+            [sys.executable, '-m', 'django', 'migrate_tenant_schemas',
+             '--tenant', str(tenant_id), '--workers', '1', '--skip-shared', '--verbosity', '0'],
+            capture_output=True, text=True, cwd=settings.BASE_DIR, env=os.environ.copy(),
+        )
+
+    def _migrate_schema(self, tenant_id):
+        alias = shard_for_tenant(tenant_id)
+        connection = connections[alias]
+        schema = schema_name_for(tenant_id)
+        token = set_migrating_schema(schema)
+        try:
+            create_schema(connection, schema)
+            # Create the schema's own migration history before public's
+            # django_migrations becomes visible through the search_path
+            with connection.cursor() as cursor:
+                cursor.execute(f'SET search_path TO {connection.ops.quote_name(schema)}')
+            MigrationRecorder(connection).ensure_schema()
+            set_search_path(connection, schema)
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+        finally:
+            reset_migrating_schema(token)
+            # Reopens on public for the next schema
+            connection.close()
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from tenants.models import Tenant
+
+User = get_user_model()
+
+
+def actual_user_counts():
+    return Coalesce(Subquery(
+        User.objects.filter(tenant_id=OuterRef('pk'))
+        .order_by()
+        .values('tenant_id')
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Repairs drift in the denormalized Tenant.user_count column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report drifted tenants.')
+
+    def handle(self, *args, **options):
+        drifted = (
+            Tenant.objects.annotate(actual_count=actual_user_counts())
+            .exclude(user_count=F('actual_count'))
+            .values_list('pk', 'name', 'user_count', 'actual_count')
+        )
+        repaired = 0
+        for pk, name, stored, actual in drifted.iterator():
+            self.stdout.write(f'{name}: stored {stored}, actual {actual}')
+            if not options['dry_run']:
+                # Recount in the UPDATE itself so concurrent changes aren't lost
+                Tenant.objects.filter(pk=pk).update(user_count=actual_user_counts())
+            repaired += 1
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {repaired} drifted tenant(s).'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from tenants.models import TenantOffboarding
+from tenants.offboarding import run_offboarding
+from tenants.tasks import offboard_tenant
+
+
+class Command(BaseCommand):
+    help = 'Resumes tenant offboardings that did not complete'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int,
+                            help='Offboarding ids (default: all unfinished).')
+        parser.add_argument('--sync', action='store_true',
+                            help='Run in this process instead of queueing a task.')
+
+    def handle(self, *args, **options):
+        offboardings = TenantOffboarding.objects.exclude(status='completed').order_by('pk')
+        if options['ids']:
+            offboardings = offboardings.filter(pk__in=options['ids'])
+
+        resumed = 0
+        for offboarding in offboardings:
+            self.stdout.write(
+                f'{offboarding.tenant_name} (#{offboarding.pk}): {offboarding.status}, '
+                f'{len(offboarding.completed_steps)} step(s) done'
+            )
+            if options['sync']:
+                run_offboarding(offboarding)
+            else:
+                offboard_tenant.delay(offboarding.pk)
+            resumed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Resumed {resumed} offboarding(s).'))
@@ -1,7 +1,9 @@
 from django.http import Http404
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
-from .models import Tenant, Domain
+from .resolver import resolve_tenant
+from .schemas import check_schema_isolation, use_tenant_schema
+from .sharding import shard_for_tenant, activate_shard, activate_tenant, deactivate_shard
 
 
 class TenantMiddleware(MiddlewareMixin):
@@ -18,16 +20,14 @@ class TenantMiddleware(MiddlewareMixin):
             request.tenant = None
             return None
         
-        # Try to identify tenant from domain
-        tenant = self._get_tenant_from_domain(request)
-        
-        # If no tenant found from domain, try from subdomain
-        if not tenant:
-            tenant = self._get_tenant_from_subdomain(request)
-        
-        # If still no tenant, try from header
-        if not tenant:
-            tenant = self._get_tenant_from_header(request)
+        # Domain, subdomain and header candidates are resolved together,
+        # in that order of precedence
+        host = request.get_host().split(':')[0]
+        tenant = resolve_tenant(
+            host=host,
+            subdomain=self._get_subdomain(host),
+            tenant_id=self._get_tenant_id_from_header(request),
+        )
         
         # Set tenant on request
         request.tenant = tenant
@@ -56,27 +56,10 @@ class TenantMiddleware(MiddlewareMixin):
         # Also skip paths without trailing slash equivalent to avoid interference
         return any(path.startswith(skip_path) or path.startswith(skip_path.rstrip('/')) for skip_path in skip_paths)
     
-    def _get_tenant_from_domain(self, request):
-        """
-        Get tenant from domain name.
-        """
-        host = request.get_host().split(':')[0]
-        
-        try:
-            domain = Domain.objects.get(
-                domain=host,
-                is_active=True
-            )
-            return domain.tenant
-        except Domain.DoesNotExist:
-            return None
-    
-    def _get_tenant_from_subdomain(self, request):
+    def _get_subdomain(self, host):
         """
-        Get tenant from subdomain.
+        Get the tenant slug candidate from a subdomain.
         """
-        host = request.get_host().split(':')[0]
-        
         # Check if it's a subdomain (e.g., tenant1.example.com)
         if '.' in host:
             subdomain = host.split('.')[0]
@@ -85,33 +68,20 @@ class TenantMiddleware(MiddlewareMixin):
             if subdomain in ['www', 'api', 'admin', 'static', 'media']:
                 return None
             
-            try:
-                tenant = Tenant.objects.get(
-                    slug=subdomain,
-                    is_active=True
-                )
-                return tenant
-            except Tenant.DoesNotExist:
-                return None
+            return subdomain
         
         return None
     
-    def _get_tenant_from_header(self, request):
+    def _get_tenant_id_from_header(self, request):
         """
-        Get tenant from custom header.
+        Get the tenant id candidate from the custom header.
         """
         tenant_header = getattr(settings, 'TENANT_HEADER', 'X-Tenant')
         tenant_id = request.headers.get(tenant_header)
         
-        if tenant_id:
-            try:
-                tenant = Tenant.objects.get(
-                    id=tenant_id,
-                    is_active=True
-                )
-                return tenant
-            except (Tenant.DoesNotExist, ValueError):
-                return None
+        # Only numeric ids can match, so don't cache arbitrary header values
+        if tenant_id and tenant_id.strip().isdigit():
+            return int(tenant_id)
         
         return None
     
@@ -132,22 +102,32 @@ class TenantDatabaseMiddleware(MiddlewareMixin):
     Middleware for setting the database connection based on tenant.
     """
     
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        check_schema_isolation()
+    
     def process_request(self, request):
         """
         Set the database connection for the current tenant.
         """
         if hasattr(request, 'tenant') and request.tenant:
-            # In a real multi-tenant setup, you might want to use different databases
-            # For now, we'll use the same database but with tenant filtering
-            request.tenant_db = 'default'
+            request.tenant_db = shard_for_tenant(request.tenant.id)
+            request._tenant_db_token = activate_tenant(request.tenant.id)
         else:
+            # Authentication activates the user's tenant later on
             request.tenant_db = 'default'
+            use_tenant_schema(request.tenant_db, None)
+            request._tenant_db_token = activate_shard(None)
     
     def process_response(self, request, response):
         """
         Clean up after processing the request.
         """
+        if hasattr(request, '_tenant_db_token'):
+            deactivate_shard(request._tenant_db_token)
+            delattr(request, '_tenant_db_token')
+        
         if hasattr(request, 'tenant_db'):
             delattr(request, 'tenant_db')
         
-        return response 
\ No newline at end of file
+        return response
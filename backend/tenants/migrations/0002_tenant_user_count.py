@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_counts(apps, schema_editor):
+    Tenant = apps.get_model('tenants', 'Tenant')
+    User = apps.get_model('accounts', 'User')
+    counts = (
+        User.objects.filter(tenant_id=OuterRef('pk'))
+        .order_by()
+        .values('tenant_id')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    Tenant.objects.update(user_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+        ('accounts', '0003_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='user_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of users in this tenant.'),
+        ),
+        migrations.RunPython(backfill_user_counts, migrations.RunPython.noop),
+    ]
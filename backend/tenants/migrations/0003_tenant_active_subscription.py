@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:15
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_active_subscriptions(apps, schema_editor):
+    Tenant = apps.get_model('tenants', 'Tenant')
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    alias = schema_editor.connection.alias
+    newest_active = (
+        Subscription.objects.using(alias)
+        .filter(tenant_id=OuterRef('pk'), status__in=('active', 'trial'))
+        .order_by('-created_at', '-pk')
+        .values('pk')[:1]
+    )
+    Tenant.objects.using(alias).update(active_subscription_id=Subquery(newest_active))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+        ('tenants', '0002_tenant_user_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='active_subscription',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Current active subscription, maintained by subscription signals.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='subscriptions.subscription'),
+        ),
+        migrations.RunPython(backfill_active_subscriptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0003_tenant_active_subscription'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tenantinvitation',
+            name='tenants_ten_status_04757b_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tenantinvitation',
+            index=models.Index(fields=['status', 'expires_at'], name='tenants_ten_status_429a22_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tenants', '0004_invitation_status_expires_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantOffboarding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tenant_id', models.PositiveBigIntegerField(db_index=True, help_text='ID of the tenant being deleted.')),
+                ('tenant_name', models.CharField(help_text='Name of the tenant being deleted.', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', help_text='Status of the offboarding.', max_length=20)),
+                ('current_step', models.CharField(blank=True, help_text='Step being processed.', max_length=100)),
+                ('completed_steps', models.JSONField(blank=True, default=list, help_text='Steps whose rows are all deleted.')),
+                ('deleted_counts', models.JSONField(blank=True, default=dict, help_text='Rows deleted so far, per step.')),
+                ('error', models.TextField(blank=True, help_text='Last error, if the offboarding failed.')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('requested_by', models.ForeignKey(blank=True, help_text='User who requested the deletion.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'tenant offboarding',
+                'verbose_name_plural': 'tenant offboardings',
+                'db_table': 'tenants_tenant_offboarding',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status'], name='tenants_ten_status_fcae6e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:40
+
+from django.db import migrations
+
+
+JSON_FIELDS = ('settings', 'metadata')
+
+
+def create_gin_indexes(apps, schema_editor):
+    # jsonb_path_ops GIN indexes serve @> containment lookups on any key
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in JSON_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS tenants_tenant_{field}_gin '
+            f'ON tenants_tenant USING gin ({field} jsonb_path_ops)'
+        )
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in JSON_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS tenants_tenant_{field}_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0005_tenant_offboarding'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def drop_user_search_triggers(apps, schema_editor):
+    # SQLite rebuilds tenants_tenant for this change, which fails while the
+    # user search triggers refer to it; they are recreated after migrate
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'accounts_user_search_%%'"
+        )
+        for (name,) in cursor.fetchall():
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+        ('tenants', '0006_tenant_json_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_user_search_triggers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tenant',
+            name='active_subscription',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, help_text='Current active subscription, maintained by subscription signals.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='subscriptions.subscription'),
+        ),
+    ]
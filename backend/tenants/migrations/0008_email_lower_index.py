@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:16
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0007_tenant_active_subscription_no_constraint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tenantinvitation',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='tenants_inv_email_lower_idx'),
+        ),
+    ]
@@ -1,13 +1,22 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import URLValidator
 from django.utils import timezone
 
 
+class TenantQuerySet(models.QuerySet):
+    def with_active_plan(self):
+        """Load the active subscription and its plan in the same query."""
+        return self.select_related('active_subscription__plan')
+
+
 class Tenant(models.Model):
     """
     Tenant model for multi-tenant architecture.
     """
+    objects = TenantQuerySet.as_manager()
+    
     name = models.CharField(
         max_length=100,
         unique=True,
@@ -89,6 +98,27 @@ class Tenant(models.Model):
         help_text=_('Additional metadata for the tenant.')
     )
     
+    # Denormalized counters, maintained by signals on accounts.User
+    user_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=_('Number of users in this tenant.')
+    )
+    
+    # Subscriptions live on the tenant's shard, or in its schema, rather than
+    # next to this row, so the pointer has no database constraint and is
+    # kept in sync by the subscription signals instead
+    active_subscription = models.ForeignKey(
+        'subscriptions.Subscription',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_constraint=False,
+        related_name='+',
+        help_text=_('Current active subscription, maintained by subscription signals.')
+    )
+    
     class Meta:
         db_table = 'tenants_tenant'
         verbose_name = _('tenant')
@@ -102,22 +132,23 @@ class Tenant(models.Model):
     def __str__(self):
         return self.name
     
+    # Columns kept up to date by signals with F() updates; saving a loaded
+    # instance leaves them out unless update_fields names them, so a stale
+    # copy is never written back
+    SIGNAL_MAINTAINED_FIELDS = ('user_count', 'active_subscription')
+    
     def save(self, *args, **kwargs):
         # Generate slug from name if not provided
         if not self.slug:
             self.slug = self.name.lower().replace(' ', '-')
+        if not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SIGNAL_MAINTAINED_FIELDS
+            ]
         super().save(*args, **kwargs)
     
-    @property
-    def user_count(self):
-        """Get the number of users in this tenant."""
-        return self.users.count()
-    
-    @property
-    def active_subscription(self):
-        """Get the active subscription for this tenant."""
-        return self.subscriptions.filter(is_active=True).first()
-    
     @property
     def current_plan(self):
         """Get the current plan for this tenant."""
@@ -250,7 +281,9 @@ class TenantInvitation(models.Model):
         verbose_name_plural = _('tenant invitations')
         indexes = [
             models.Index(fields=['email']),
-            models.Index(fields=['status']),
+            models.Index(Lower('email'), name='tenants_inv_email_lower_idx'),
+            # Also serves status-only lookups; drives the expiry sweep
+            models.Index(fields=['status', 'expires_at']),
             models.Index(fields=['token']),
             models.Index(fields=['expires_at']),
         ]
@@ -271,17 +304,18 @@ class TenantInvitation(models.Model):
         if self.status != 'pending':
             raise ValueError("Invitation is not pending")
         
-        # Assign user to tenant
-        user.tenant = self.tenant
-        user.role = self.role
-        if self.role == 'tenant_admin':
-            user.is_tenant_admin = True
-        user.save()
-        
-        # Update invitation
-        self.status = 'accepted'
-        self.accepted_at = timezone.now()
-        self.save()
+        with transaction.atomic():
+            # Assign user to tenant (user counts follow via signals)
+            user.tenant = self.tenant
+            user.role = self.role
+            if self.role == 'tenant_admin':
+                user.is_tenant_admin = True
+            user.save()
+            
+            # Update invitation
+            self.status = 'accepted'
+            self.accepted_at = timezone.now()
+            self.save()
     
     def decline(self):
         """Decline the invitation."""
@@ -289,4 +323,88 @@ class TenantInvitation(models.Model):
             raise ValueError("Invitation is not pending")
         
         self.status = 'declined'
-        self.save() 
\ No newline at end of file
+        self.save() 
+
+class TenantOffboarding(models.Model):
+    """
+    Progress of a background tenant deletion.
+    
+    Kept after the tenant row is gone, so it stores the tenant id and name
+    rather than a foreign key.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    tenant_id = models.PositiveBigIntegerField(
+        db_index=True,
+        help_text=_('ID of the tenant being deleted.')
+    )
+    
+    tenant_name = models.CharField(
+        max_length=255,
+        help_text=_('Name of the tenant being deleted.')
+    )
+    
+    requested_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text=_('User who requested the deletion.')
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        help_text=_('Status of the offboarding.')
+    )
+    
+    current_step = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text=_('Step being processed.')
+    )
+    
+    completed_steps = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_('Steps whose rows are all deleted.')
+    )
+    
+    deleted_counts = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text=_('Rows deleted so far, per step.')
+    )
+    
+    error = models.TextField(
+        blank=True,
+        help_text=_('Last error, if the offboarding failed.')
+    )
+    
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'tenants_tenant_offboarding'
+        verbose_name = _('tenant offboarding')
+        verbose_name_plural = _('tenant offboardings')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status']),
+        ]
+    
+    def __str__(self):
+        return f"Offboarding of {self.tenant_name} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status == 'completed'
@@ -0,0 +1,151 @@
+"""
+Background tenant deletion.
+
+``start_offboarding`` deactivates the tenant and queues ``offboard_tenant``,
+which deletes the tenant's rows table by table, children first, in short
+batches. Progress is saved after every batch so a crashed run can be
+resumed with ``manage.py resume_offboarding``; completed steps are skipped
+and the current one simply carries on with whatever rows are left.
+"""
+import contextvars
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import Tenant, TenantOffboarding
+from .sharding import shard_for_tenant, tenant_context
+
+
+logger = logging.getLogger(__name__)
+
+_offboarding = contextvars.ContextVar('offboarding', default=False)
+
+# (model, lookup to the tenant id, database), children before parents.
+# 'shard' is the tenant's shard; users also have a directory copy on the
+# default database.
+OFFBOARDING_STEPS = [
+    ('billing.Payment', 'invoice__tenant_id', 'shard'),
+    ('billing.InvoiceItem', 'invoice__tenant_id', 'shard'),
+    ('billing.Invoice', 'tenant_id', 'shard'),
+    ('billing.BillingSettings', 'tenant_id', 'shard'),
+    ('subscriptions.PlanChange', 'subscription__tenant_id', 'shard'),
+    ('subscriptions.Subscription', 'tenant_id', 'shard'),
+    ('tenants.TenantInvitation', 'tenant_id', 'default'),
+    ('tenants.Domain', 'tenant_id', 'default'),
+    ('accounts.UserProfile', 'user__tenant_id', 'shard'),
+    ('accounts.User', 'tenant_id', 'shard'),
+    ('accounts.User', 'tenant_id', 'default'),
+]
+
+
+def is_offboarding():
+    """
+    True while offboarding deletes rows. Receivers that keep per-tenant
+    bookkeeping (user counts, the active subscription, user copies) skip
+    their work, since the tenant and all its rows are going away.
+    """
+    return _offboarding.get()
+
+
+def _steps(tenant_id):
+    shard = shard_for_tenant(tenant_id)
+    steps = []
+    for label, lookup, home in OFFBOARDING_STEPS:
+        alias = shard if home == 'shard' else DEFAULT_DB_ALIAS
+        name = f'{label}@{alias}'
+        # Unsharded deployments would list the user step twice
+        if name not in [step[0] for step in steps]:
+            steps.append((name, apps.get_model(label), lookup, alias))
+    return steps
+
+
+def start_offboarding(tenant, requested_by=None):
+    """
+    Deactivate ``tenant`` now and delete its data in the background. An
+    offboarding of the tenant that is already pending or running is
+    returned instead of starting another.
+    """
+    from .tasks import offboard_tenant
+
+    with transaction.atomic():
+        # Serializes concurrent requests to delete the same tenant
+        list(Tenant.objects.filter(pk=tenant.pk).select_for_update().values_list('pk', flat=True))
+        in_progress = (
+            TenantOffboarding.objects
+            .filter(tenant_id=tenant.pk, status__in=['pending', 'running'])
+            .order_by('-pk')
+            .first()
+        )
+        if in_progress is not None:
+            return in_progress
+        tenant.is_active = False
+        tenant.save(update_fields=['is_active', 'updated_at'])
+        offboarding = TenantOffboarding.objects.create(
+            tenant_id=tenant.pk,
+            tenant_name=tenant.name,
+            requested_by=requested_by,
+        )
+        transaction.on_commit(lambda: offboard_tenant.delay(offboarding.pk))
+    return offboarding
+
+
+def _delete_batch(model, lookup, alias, tenant_id, batch_size):
+    ids = list(
+        model._base_manager.using(alias)
+        .filter(**{lookup: tenant_id})
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    with transaction.atomic(using=alias):
+        model._base_manager.using(alias).filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def run_offboarding(offboarding, batch_size=None):
+    """Delete the remaining rows of ``offboarding``, then the tenant itself."""
+    batch_size = batch_size or getattr(settings, 'TENANT_OFFBOARDING_BATCH_SIZE', 1000)
+    tenant_id = offboarding.tenant_id
+    offboarding.status = 'running'
+    offboarding.started_at = offboarding.started_at or timezone.now()
+    offboarding.error = ''
+    offboarding.save(update_fields=['status', 'started_at', 'error', 'updated_at'])
+
+    token = _offboarding.set(True)
+    try:
+        with tenant_context(tenant_id):
+            # Nothing may point at the subscriptions about to be deleted
+            for alias in dict.fromkeys([DEFAULT_DB_ALIAS, shard_for_tenant(tenant_id)]):
+                Tenant.objects.using(alias).filter(pk=tenant_id).update(active_subscription=None)
+
+            for name, model, lookup, alias in _steps(tenant_id):
+                if name in offboarding.completed_steps:
+                    continue
+                offboarding.current_step = name
+                while True:
+                    deleted = _delete_batch(model, lookup, alias, tenant_id, batch_size)
+                    if not deleted:
+                        break
+                    offboarding.deleted_counts[name] = offboarding.deleted_counts.get(name, 0) + deleted
+                    offboarding.save(update_fields=['current_step', 'deleted_counts', 'updated_at'])
+                offboarding.completed_steps.append(name)
+                offboarding.save(update_fields=['current_step', 'completed_steps', 'updated_at'])
+    except Exception as exc:
+        offboarding.status = 'failed'
+        offboarding.error = repr(exc)
+        offboarding.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+    finally:
+        _offboarding.reset(token)
+
+    # The tenant row is now childless; its shard copy follows via signals
+    Tenant.objects.filter(pk=tenant_id).delete()
+    offboarding.status = 'completed'
+    offboarding.current_step = ''
+    offboarding.completed_at = timezone.now()
+    offboarding.save(update_fields=['status', 'current_step', 'completed_at', 'updated_at'])
+    logger.info('Offboarded tenant %s: %s', tenant_id, offboarding.deleted_counts)
+    return offboarding
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CACHE_PREFIX = 'tenants:resolver'
+
+# Stored in place of a tenant so that unknown identifiers are cached too.
+MISS = '__tenant_miss__'
+
+
+class LocalLRUCache:
+    """
+    Small thread-safe LRU cache with per-entry expiry, local to the process.
+    """
+
+    def __init__(self, maxsize=1024, timeout=5):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def domain_cache_key(host):
+    return f'{CACHE_PREFIX}:host:{host}'
+
+
+def subdomain_cache_key(slug):
+    return f'{CACHE_PREFIX}:slug:{slug}'
+
+
+def header_cache_key(tenant_id):
+    return f'{CACHE_PREFIX}:id:{tenant_id}'
+
+
+class TenantResolverCache:
+    """
+    Two-level cache for tenant lookups: a per-process LRU in front of the
+    shared Django cache. Misses are cached as well, for a shorter time.
+    """
+
+    def __init__(self):
+        self.local = LocalLRUCache(
+            maxsize=getattr(settings, 'TENANT_RESOLVER_LOCAL_MAXSIZE', 1024),
+            timeout=getattr(settings, 'TENANT_RESOLVER_LOCAL_TIMEOUT', 5),
+        )
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'TENANT_RESOLVER_CACHE_TIMEOUT', 300)
+
+    @property
+    def miss_timeout(self):
+        return getattr(settings, 'TENANT_RESOLVER_MISS_TIMEOUT', 60)
+
+    def get_many(self, keys):
+        """
+        Return the cached values for ``keys``; unknown keys are left out.
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            for key, value in cache.get_many(missing).items():
+                self.local.set(key, value)
+                found[key] = value
+        return found
+
+    def store(self, key, tenant):
+        value = tenant if tenant is not None else MISS
+        timeout = self.timeout if tenant is not None else self.miss_timeout
+        cache.set(key, value, timeout)
+        self.local.set(key, value)
+        return value
+
+    def invalidate(self, keys):
+        keys = [key for key in keys if key]
+        if not keys:
+            return
+        self.local.delete_many(keys)
+        cache.delete_many(keys)
+
+    def clear(self):
+        self.local.clear()
+
+
+tenant_resolver_cache = TenantResolverCache()
+
+
+# One indexed branch per identifier, in order of precedence
+_LOOKUP_BRANCHES = (
+    'SELECT t.*, 0 AS matched_by FROM tenants_tenant t '
+    'INNER JOIN tenants_domain d ON d.tenant_id = t.id '
+    'WHERE d.domain = %s AND d.is_active = %s AND t.is_active = %s',
+    'SELECT t.*, 1 AS matched_by FROM tenants_tenant t '
+    'WHERE t.slug = %s AND t.is_active = %s',
+    'SELECT t.*, 2 AS matched_by FROM tenants_tenant t '
+    'WHERE t.id = %s AND t.is_active = %s',
+)
+
+
+def lookup_tenants(host=None, subdomain=None, tenant_id=None):
+    """
+    Look up every candidate identifier in a single query.
+
+    Each identifier becomes one branch of a ``UNION ALL`` joining
+    ``tenants_domain`` to ``tenants_tenant``, so a miss on one strategy
+    doesn't cost another round trip. Returns ``(by_host, by_subdomain,
+    by_id)``, each the matching active tenant or ``None``.
+    """
+    from .models import Tenant
+
+    identifiers = (
+        (host, True, True),
+        (subdomain, True),
+        (tenant_id, True),
+    )
+    statements = []
+    params = []
+    for sql, branch_params in zip(_LOOKUP_BRANCHES, identifiers):
+        if branch_params[0]:
+            statements.append(sql)
+            params.extend(branch_params)
+    if not statements:
+        return None, None, None
+
+    matches = [None, None, None]
+    for tenant in Tenant.objects.raw(' UNION ALL '.join(statements), params):
+        matches[tenant.matched_by] = tenant
+    return tuple(matches)
+
+
+def resolve_tenant(host=None, subdomain=None, tenant_id=None):
+    """
+    Resolve the tenant for a request, preferring the domain, then the
+    subdomain slug, then the tenant header.
+
+    Cached answers are used as long as they settle the precedence; otherwise
+    all identifiers are looked up together and cached individually.
+    """
+    candidates = [
+        domain_cache_key(host) if host else None,
+        subdomain_cache_key(subdomain) if subdomain else None,
+        header_cache_key(tenant_id) if tenant_id else None,
+    ]
+    cached = tenant_resolver_cache.get_many([key for key in candidates if key])
+
+    for key in candidates:
+        if key is None:
+            continue
+        value = cached.get(key)
+        if value is None:
+            break
+        if value != MISS:
+            return value
+    else:
+        return None
+
+    tenants = lookup_tenants(host=host, subdomain=subdomain, tenant_id=tenant_id)
+    for key, tenant in zip(candidates, tenants):
+        if key is not None:
+            tenant_resolver_cache.store(key, tenant)
+    return next((tenant for tenant in tenants if tenant is not None), None)
+
+
+def invalidate_tenant(tenant, old_slug=None):
+    """
+    Drop every cached entry that may resolve to ``tenant``.
+    """
+    from .models import Domain
+
+    keys = [
+        subdomain_cache_key(tenant.slug),
+        header_cache_key(tenant.pk),
+    ]
+    if old_slug and old_slug != tenant.slug:
+        keys.append(subdomain_cache_key(old_slug))
+    hosts = Domain.objects.filter(tenant_id=tenant.pk).values_list('domain', flat=True)
+    keys.extend(domain_cache_key(host) for host in hosts)
+    tenant_resolver_cache.invalidate(keys)
+
+
+def invalidate_domain(host, old_host=None):
+    """
+    Drop cached entries for a domain, including its previous value.
+    """
+    keys = [domain_cache_key(host)]
+    if old_host and old_host != host:
+        keys.append(domain_cache_key(old_host))
+    tenant_resolver_cache.invalidate(keys)
@@ -0,0 +1,79 @@
+from .schemas import get_migrating_schema, tenant_schema_models
+from .sharding import all_shards, get_current_shard, shard_for_tenant
+
+
+# Tenant-owned models, mapped to how their tenant is found on an instance:
+# either the tenant id attribute, or the parent relation they follow.
+TENANT_OWNED_MODELS = {
+    'accounts.user': 'tenant_id',
+    'accounts.userprofile': 'user',
+    'subscriptions.subscription': 'tenant_id',
+    'subscriptions.planchange': 'subscription',
+    'billing.invoice': 'tenant_id',
+    'billing.invoiceitem': 'invoice',
+    'billing.payment': 'invoice',
+    'billing.billingsettings': 'tenant_id',
+}
+
+
+class TenantShardRouter:
+    """
+    Database router that keeps tenant-owned rows on their tenant's shard.
+
+    Instances already loaded from a shard stay there; new instances go to
+    the shard of their tenant; bare queries use the shard activated for the
+    current request. Everything else uses the default database.
+    """
+
+    def _shard_for_instance(self, instance):
+        label = instance._meta.label_lower
+        if label == 'tenants.tenant':
+            # Related-object hints may be the tenant itself
+            return shard_for_tenant(instance.pk)
+        path = TENANT_OWNED_MODELS.get(label)
+        if path is None:
+            return None
+        if path == 'tenant_id':
+            # Users have a directory copy on the default database, so they
+            # are always routed by tenant rather than by where they were read
+            if instance._state.db and label != 'accounts.user':
+                return instance._state.db
+            tenant_id = instance.tenant_id
+            return shard_for_tenant(tenant_id) if tenant_id else None
+        if instance._state.db:
+            return instance._state.db
+        # Only follow parents that are already loaded, never query for them
+        parent = instance._meta.get_field(path).get_cached_value(instance, None)
+        if parent is not None:
+            return self._shard_for_instance(parent)
+        return None
+
+    def _db_for_model(self, model, **hints):
+        if model._meta.label_lower not in TENANT_OWNED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None:
+            alias = self._shard_for_instance(instance)
+            if alias:
+                return alias
+        return get_current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        shards = all_shards()
+        if obj1._state.db in shards and obj2._state.db in shards:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if get_migrating_schema():
+            # Tenant schemas only hold the tenant tables; shared ones such as
+            # plans are found in public through the search_path
+            return model_name is not None and f'{app_label}.{model_name}' in tenant_schema_models()
+        # Every shard carries the full schema; catalog rows are replicated
+        return db in all_shards() or None
@@ -0,0 +1,91 @@
+"""
+Optional schema-per-tenant isolation on PostgreSQL.
+
+With ``TENANT_ISOLATION_MODE = 'schema'`` the tables of ``TENANT_SCHEMA_MODELS``
+are created in one schema per tenant (see the ``migrate_tenant_schemas``
+command) and requests switch the ``search_path`` of their pooled connection
+to ``<tenant schema>, public``; shared tables stay in ``public``.
+"""
+import contextvars
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+
+_migrating_schema = contextvars.ContextVar('migrating_schema', default=None)
+
+
+def schema_isolation_enabled():
+    return getattr(settings, 'TENANT_ISOLATION_MODE', 'row') == 'schema'
+
+
+def check_schema_isolation(alias='default'):
+    if schema_isolation_enabled() and connections[alias].vendor != 'postgresql':
+        raise ImproperlyConfigured(
+            "TENANT_ISOLATION_MODE = 'schema' requires PostgreSQL."
+        )
+
+
+def schema_name_for(tenant_id):
+    # Based on the id so renaming a tenant never orphans its schema
+    return f'tenant_{int(tenant_id)}'
+
+
+def tenant_schema_models():
+    """Lowercase ``app_label.model`` labels of the models kept in tenant schemas."""
+    return {label.lower() for label in getattr(settings, 'TENANT_SCHEMA_MODELS', [])}
+
+
+def set_search_path(connection, schema):
+    """Point ``connection`` at ``schema`` (then ``public``), or at ``public`` alone."""
+    with connection.cursor() as cursor:
+        if schema:
+            cursor.execute(
+                f'SET search_path TO {connection.ops.quote_name(schema)}, public'
+            )
+        else:
+            cursor.execute('SET search_path TO public')
+    connection.tenant_schema = schema
+
+
+def use_tenant_schema(alias, tenant_id):
+    """
+    Switch the connection for ``alias`` to the tenant's schema, or back to
+    ``public`` when ``tenant_id`` is None. Pooled connections remember their
+    current schema, so repeated requests for the same tenant skip the SET.
+    """
+    if not schema_isolation_enabled():
+        return
+    use_schema(alias, schema_name_for(tenant_id) if tenant_id else None)
+
+
+def current_schema(alias):
+    """The tenant schema the connection for ``alias`` points at, or None for ``public``."""
+    connection = connections[alias]
+    # A closed connection reopens with the default search_path
+    return getattr(connection, 'tenant_schema', None) if connection.connection is not None else None
+
+
+def use_schema(alias, schema):
+    """Switch the connection for ``alias`` to ``schema``, or to ``public`` when None."""
+    if not schema_isolation_enabled() or current_schema(alias) == schema:
+        return
+    set_search_path(connections[alias], schema)
+
+
+def create_schema(connection, schema):
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {connection.ops.quote_name(schema)}')
+
+
+def get_migrating_schema():
+    return _migrating_schema.get()
+
+
+def set_migrating_schema(schema):
+    return _migrating_schema.set(schema)
+
+
+def reset_migrating_schema(token):
+    _migrating_schema.reset(token)
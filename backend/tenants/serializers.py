@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Tenant, Domain, TenantInvitation
+from .models import Tenant, Domain, TenantInvitation, TenantOffboarding
 
 
 class TenantSerializer(serializers.ModelSerializer):
@@ -17,6 +18,13 @@ class TenantSerializer(serializers.ModelSerializer):
             'metadata', 'user_count'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only write what was sent; the counters may have moved since loading
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
 class DomainSerializer(serializers.ModelSerializer):
@@ -42,4 +50,47 @@ class TenantInvitationSerializer(serializers.ModelSerializer):
             'id', 'tenant', 'email', 'role', 'invited_by', 'status',
             'token', 'expires_at', 'accepted_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'token', 'created_at', 'updated_at'] 
\ No newline at end of file
+        read_only_fields = ['id', 'token', 'created_at', 'updated_at'] 
+
+
+class TenantInvitationBulkSerializer(serializers.Serializer):
+    """
+    Serializer for inviting many emails to a tenant at once.
+    """
+    emails = serializers.ListField(
+        child=serializers.EmailField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'TENANT_INVITATION_BULK_LIMIT', 5000)
+    )
+    role = serializers.ChoiceField(
+        choices=[('user', 'User'), ('tenant_admin', 'Tenant Admin')],
+        default='user'
+    )
+    tenant = serializers.PrimaryKeyRelatedField(
+        queryset=Tenant.objects.filter(is_active=True),
+        required=False,
+        help_text='Tenant to invite to; system admins only.'
+    )
+    
+    def validate(self, attrs):
+        user = self.context['request'].user
+        if not user.is_admin or 'tenant' not in attrs:
+            # Tenant admins always invite to their own tenant
+            if not user.tenant:
+                raise serializers.ValidationError({'tenant': 'No tenant associated'})
+            attrs['tenant'] = user.tenant
+        return attrs
+
+
+class TenantOffboardingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for TenantOffboarding model.
+    """
+    class Meta:
+        model = TenantOffboarding
+        fields = [
+            'id', 'tenant_id', 'tenant_name', 'requested_by', 'status',
+            'current_step', 'completed_steps', 'deleted_counts', 'error',
+            'started_at', 'completed_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,167 @@
+"""
+Tenant shard map and the per-request shard context used by TenantShardRouter.
+
+Catalog tables (tenants, plans) live on the default database and are copied
+to the shards so foreign keys from tenant-owned rows stay valid there. Users
+are written to their tenant's shard and copied back to the default database,
+which acts as the login directory.
+
+Known limits:
+
+* A row and its copies are written by separate transactions, one per
+  database, so a failure between them leaves a copy missing or stale until
+  the row is saved again.
+* Nothing moves a tenant between shards. Changing its entry in
+  ``TENANT_SHARD_MAP`` only routes new queries; its rows, user copies
+  included, stay on the old shard and have to be copied over and deleted
+  there by hand.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+_replicating = contextvars.ContextVar('replicating', default=False)
+
+
+def all_shards():
+    """Return every database alias that holds tenant data."""
+    return list(getattr(settings, 'TENANT_SHARDS', [DEFAULT_DB_ALIAS]))
+
+
+def is_sharded():
+    return len(all_shards()) > 1
+
+
+def shard_for_tenant(tenant_id):
+    """
+    Return the database alias for a tenant.
+
+    Explicit entries in ``TENANT_SHARD_MAP`` win; everything else is placed
+    by tenant id modulo the number of shards.
+    """
+    if tenant_id is None:
+        return DEFAULT_DB_ALIAS
+    shard_map = getattr(settings, 'TENANT_SHARD_MAP', {})
+    alias = shard_map.get(str(tenant_id))
+    if alias:
+        return alias
+    shards = all_shards()
+    return shards[int(tenant_id) % len(shards)]
+
+
+def shard_id_offset(alias):
+    """
+    First auto-increment id handed out on ``alias``. Each shard numbers its
+    tenant-owned rows from its own range, so ids stay unique across shards
+    and users copied to the default database never collide.
+    """
+    return all_shards().index(alias) * getattr(settings, 'TENANT_SHARD_ID_RANGE', 10 ** 12)
+
+
+def reserve_shard_id_range(alias, models):
+    """Move the id sequences of ``models`` on ``alias`` into the shard's range."""
+    offset = shard_id_offset(alias)
+    if not offset:
+        return
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT setval(pg_get_serial_sequence(%s, %s), '
+                    'GREATEST(%s, (SELECT COALESCE(MAX({pk}), 0) FROM {table})))'.format(
+                        pk=connection.ops.quote_name(model._meta.pk.column),
+                        table=connection.ops.quote_name(table),
+                    ),
+                    [table, model._meta.pk.column, offset],
+                )
+            elif connection.vendor == 'sqlite':
+                cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s AND seq < %s',
+                               [table, offset])
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                               'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                               [table, offset, table])
+
+
+def get_current_shard():
+    return _current_shard.get()
+
+
+def activate_shard(alias):
+    """Route tenant-owned queries to ``alias``; returns a token for ``deactivate_shard``."""
+    return _current_shard.set(alias)
+
+
+def deactivate_shard(token):
+    _current_shard.reset(token)
+
+
+def activate_tenant(tenant_id):
+    """
+    Route tenant-owned queries to the tenant's shard and, in schema
+    isolation mode, to its schema. Returns a token for ``deactivate_shard``.
+    """
+    from .schemas import use_tenant_schema
+
+    alias = shard_for_tenant(tenant_id)
+    use_tenant_schema(alias, tenant_id)
+    return activate_shard(alias)
+
+
+@contextmanager
+def tenant_context(tenant_id):
+    """
+    Route tenant-owned queries to the shard of ``tenant_id`` inside the
+    block, then back to the shard and schema that were active before it.
+    """
+    from .schemas import current_schema, use_schema
+
+    alias = shard_for_tenant(tenant_id)
+    previous_schema = current_schema(alias)
+    token = activate_tenant(tenant_id)
+    try:
+        yield
+    finally:
+        use_schema(alias, previous_schema)
+        deactivate_shard(token)
+
+
+def replicate_row(instance, aliases, exclude=()):
+    """
+    Copy ``instance`` to each alias in ``aliases``. Fields in ``exclude`` are
+    maintained on each database separately and are left alone on updates.
+
+    Existing copies are updated through the queryset and new ones inserted
+    as ``raw`` saves (which receivers ignore), so copies don't bounce back.
+    """
+    model = type(instance)
+    values = {field.attname: getattr(instance, field.attname)
+              for field in model._meta.concrete_fields
+              if not field.primary_key and field.name not in exclude}
+    for alias in aliases:
+        updated = model._base_manager.using(alias).filter(pk=instance.pk).update(**values)
+        if not updated:
+            model(pk=instance.pk, **values).save_base(using=alias, raw=True, force_insert=True)
+
+
+def delete_replicas(instance, aliases):
+    """
+    Delete the copies of ``instance``. Signals still fire for the cascade;
+    receivers that must only count the original check ``is_replicating``.
+    """
+    model = type(instance)
+    token = _replicating.set(True)
+    try:
+        for alias in aliases:
+            model._base_manager.using(alias).filter(pk=instance.pk).delete()
+    finally:
+        _replicating.reset(token)
+
+
+def is_replicating():
+    return _replicating.get()
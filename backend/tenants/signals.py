@@ -0,0 +1,154 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete, post_init, post_migrate
+from django.dispatch import receiver
+
+from .json_indexes import sync_json_key_columns
+from .models import Tenant, Domain
+from .offboarding import is_offboarding
+from .resolver import invalidate_tenant, invalidate_domain
+from .sharding import (
+    all_shards,
+    is_sharded,
+    shard_for_tenant,
+    replicate_row,
+    delete_replicas,
+    is_replicating,
+)
+
+
+@receiver(pre_save, sender=Tenant)
+def remember_tenant_slug(sender, instance, **kwargs):
+    """Keep the stored slug so its cache entry can be dropped on rename."""
+    if instance.pk:
+        instance._resolver_old_slug = (
+            Tenant.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_resolution(sender, instance, **kwargs):
+    invalidate_tenant(instance, old_slug=getattr(instance, '_resolver_old_slug', None))
+
+
+@receiver(pre_save, sender=Domain)
+def remember_domain_host(sender, instance, **kwargs):
+    """Keep the stored host so its cache entry can be dropped on rename."""
+    if instance.pk:
+        instance._resolver_old_host = (
+            Domain.objects.filter(pk=instance.pk).values_list('domain', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def invalidate_domain_resolution(sender, instance, **kwargs):
+    invalidate_domain(instance.domain, old_host=getattr(instance, '_resolver_old_host', None))
+
+
+def _replicate(instance, using, homes, exclude=()):
+    if is_sharded():
+        replicate_row(
+            instance,
+            [alias for alias in dict.fromkeys(homes) if alias != using],
+            exclude=exclude,
+        )
+
+
+def _delete_replicas(instance, using, homes):
+    if is_sharded():
+        delete_replicas(instance, [alias for alias in dict.fromkeys(homes) if alias != using])
+
+
+# Catalog rows are copied to the shards that reference them, and users are
+# copied back to the default database, which serves as the login directory.
+
+@receiver(post_save, sender=Tenant)
+def replicate_tenant(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        # The active subscription pointer lives next to the subscriptions
+        # and the counters are adjusted on every copy by their receivers
+        _replicate(instance, using, [DEFAULT_DB_ALIAS, shard_for_tenant(instance.pk)],
+                   exclude=Tenant.SIGNAL_MAINTAINED_FIELDS)
+
+
+@receiver(post_delete, sender=Tenant)
+def delete_tenant_replicas(sender, instance, using=None, **kwargs):
+    _delete_replicas(instance, using, [DEFAULT_DB_ALIAS, shard_for_tenant(instance.pk)])
+
+
+@receiver(post_save, sender='subscriptions.Plan')
+def replicate_plan(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        _replicate(instance, using, all_shards())
+
+
+@receiver(post_delete, sender='subscriptions.Plan')
+def delete_plan_replicas(sender, instance, using=None, **kwargs):
+    _delete_replicas(instance, using, all_shards())
+
+
+@receiver(post_save, sender='accounts.User')
+def replicate_user(sender, instance, raw=False, using=None, **kwargs):
+    if not raw and not is_offboarding():
+        _replicate(instance, using, [DEFAULT_DB_ALIAS, shard_for_tenant(instance.tenant_id)])
+
+
+@receiver(post_delete, sender='accounts.User')
+def delete_user_replicas(sender, instance, using=None, **kwargs):
+    # Offboarding deletes every copy itself
+    if is_offboarding():
+        return
+    _delete_replicas(instance, using, [DEFAULT_DB_ALIAS, shard_for_tenant(instance.tenant_id)])
+
+
+@receiver(connection_created)
+def forget_tenant_schema(sender, connection, **kwargs):
+    """New connections start with the server's default search_path."""
+    connection.tenant_schema = None
+
+
+def _adjust_user_count(tenant_id, delta):
+    if not tenant_id:
+        return
+    # Replication leaves the counter alone, so each copy is adjusted in place
+    for alias in dict.fromkeys([DEFAULT_DB_ALIAS, shard_for_tenant(tenant_id)]):
+        tenants = Tenant.objects.using(alias).filter(pk=tenant_id)
+        if delta < 0:
+            tenants = tenants.filter(user_count__gte=-delta)
+        tenants.update(user_count=F('user_count') + delta)
+
+
+@receiver(post_init, sender='accounts.User')
+def remember_user_tenant(sender, instance, **kwargs):
+    # Skip deferred tenant ids rather than fetching them
+    if 'tenant_id' in instance.__dict__:
+        instance._original_tenant_id = instance.tenant_id
+
+
+@receiver(post_save, sender='accounts.User')
+def update_tenant_user_count(sender, instance, created, raw=False, **kwargs):
+    if raw or is_offboarding():
+        return
+    if created:
+        _adjust_user_count(instance.tenant_id, 1)
+    elif getattr(instance, '_original_tenant_id', instance.tenant_id) != instance.tenant_id:
+        _adjust_user_count(instance._original_tenant_id, -1)
+        _adjust_user_count(instance.tenant_id, 1)
+    instance._original_tenant_id = instance.tenant_id
+
+
+@receiver(post_delete, sender='accounts.User')
+def decrement_tenant_user_count(sender, instance, **kwargs):
+    if is_replicating() or is_offboarding():
+        return
+    _adjust_user_count(getattr(instance, '_original_tenant_id', instance.tenant_id), -1)
+
+
+@receiver(post_migrate)
+def sync_tenant_json_indexes(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Table rebuilds during migrate drop the generated columns
+    if sender.name == 'tenants':
+        sync_json_key_columns(connections[using])
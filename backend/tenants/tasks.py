@@ -0,0 +1,55 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from .invitations import invitation_url, expire_invitations
+from .models import TenantInvitation, TenantOffboarding
+from .offboarding import run_offboarding
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def send_invitation_emails(invitation_ids):
+    """Send one batch of invitation emails over a single mail connection."""
+    invitations = (
+        TenantInvitation.objects
+        .filter(pk__in=invitation_ids, status='pending')
+        .select_related('tenant', 'invited_by')
+    )
+    messages = [
+        EmailMessage(
+            subject=f'You have been invited to join {invitation.tenant.name}',
+            body=(
+                f'{invitation.invited_by.get_full_name() or invitation.invited_by.email} '
+                f'invited you to join {invitation.tenant.name}.\n\n'
+                f'Accept the invitation: {invitation_url(invitation)}\n\n'
+                f'This invitation expires on {invitation.expires_at:%Y-%m-%d}.'
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[invitation.email],
+        )
+        for invitation in invitations
+    ]
+    with get_connection() as connection:
+        sent = connection.send_messages(messages) or 0
+    logger.info('Sent %d of %d invitation emails', sent, len(invitation_ids))
+    return sent
+
+
+@shared_task
+def expire_stale_invitations():
+    """Periodic sweep that marks expired pending invitations."""
+    return expire_invitations()
+
+
+@shared_task
+def offboard_tenant(offboarding_id):
+    """Delete an offboarded tenant's data; safe to run again after a crash."""
+    offboarding = TenantOffboarding.objects.get(pk=offboarding_id)
+    if offboarding.is_finished:
+        return offboarding.deleted_counts
+    return run_offboarding(offboarding).deleted_counts
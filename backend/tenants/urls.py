@@ -1,7 +1,16 @@
 from django.urls import re_path
-from .views import TenantListView, TenantDetailView
+from .views import (
+    TenantListView,
+    TenantDetailView,
+    TenantInvitationBulkCreateView,
+    TenantOffboardingDetailView,
+    TenantExportView,
+)
 
 urlpatterns = [
     re_path(r'^$', TenantListView.as_view(), name='tenant-list'),
     re_path(r'^(?P<pk>\d+)/?$', TenantDetailView.as_view(), name='tenant-detail'),
+    re_path(r'^(?P<pk>\d+)/export/?$', TenantExportView.as_view(), name='tenant-export'),
+    re_path(r'^invitations/bulk/?$', TenantInvitationBulkCreateView.as_view(), name='tenant-invitation-bulk'),
+    re_path(r'^offboardings/(?P<pk>\d+)/?$', TenantOffboardingDetailView.as_view(), name='tenant-offboarding-detail'),
 ]
\ No newline at end of file
@@ -1,22 +1,124 @@
-from rest_framework import generics, permissions
-from .models import Tenant
-from .serializers import TenantSerializer
-from accounts.permissions import IsSystemAdmin
+from django.http import StreamingHttpResponse
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .export import (
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    EXPORT_RECORD_TYPES,
+    export_filename,
+    stream_tenant_export,
+)
+from .filters import TenantJSONFilterBackend
+from .invitations import create_invitations
+from .models import Tenant, TenantOffboarding
+from .offboarding import start_offboarding
+from .serializers import (
+    TenantSerializer,
+    TenantInvitationBulkSerializer,
+    TenantOffboardingSerializer,
+)
+from accounts.permissions import IsSystemAdmin, IsTenantAdmin
+from subscription_management.conditional import ConditionalGetMixin
 
 
 class TenantListView(generics.ListCreateAPIView):
     """
     List and create tenants (Admin only).
+    Supports JSON key filters such as ?settings.features.beta=true.
     """
     queryset = Tenant.objects.all()
     serializer_class = TenantSerializer
     permission_classes = [permissions.IsAuthenticated, IsSystemAdmin]
+    filter_backends = [*api_settings.DEFAULT_FILTER_BACKENDS, TenantJSONFilterBackend]
 
 
-class TenantDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TenantDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update and delete tenant (Admin only).
+    Deleting deactivates the tenant and removes its data in the background.
     """
     queryset = Tenant.objects.all()
     serializer_class = TenantSerializer
-    permission_classes = [permissions.IsAuthenticated, IsSystemAdmin] 
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated, IsSystemAdmin]
+    # user_count is maintained with UPDATEs that leave updated_at alone
+    etag_fields = ('updated_at', 'user_count')
+    
+    def destroy(self, request, *args, **kwargs):
+        offboarding = start_offboarding(self.get_object(), requested_by=request.user)
+        return Response(
+            TenantOffboardingSerializer(offboarding).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class TenantOffboardingDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """
+    Retrieve the progress of a tenant deletion (Admin only).
+    """
+    queryset = TenantOffboarding.objects.all()
+    serializer_class = TenantOffboardingSerializer
+    permission_classes = [permissions.IsAuthenticated, IsSystemAdmin]
+
+
+class TenantInvitationBulkCreateView(generics.GenericAPIView):
+    """
+    Invite a list of emails to a tenant (Tenant admin or Admin).
+    Emails are sent in the background.
+    """
+    serializer_class = TenantInvitationBulkSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTenantAdmin]
+    
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        invitations, skipped = create_invitations(
+            tenant=serializer.validated_data['tenant'],
+            emails=serializer.validated_data['emails'],
+            role=serializer.validated_data['role'],
+            invited_by=request.user,
+        )
+        return Response({
+            'invited': len(invitations),
+            'skipped': skipped,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class TenantExportView(generics.GenericAPIView):
+    """
+    Stream a tenant's data as NDJSON or CSV (Tenant admin or Admin).
+    Query parameters: output=ndjson|csv, compress=gzip, types=user,invoice,...
+    """
+    queryset = Tenant.objects.all()
+    permission_classes = [permissions.IsAuthenticated, IsTenantAdmin]
+    
+    def get(self, request, *args, **kwargs):
+        tenant = self.get_object()
+        if not request.user.is_admin and request.user.tenant_id != tenant.pk:
+            return Response({
+                'error': 'You do not have access to this tenant'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        output = request.query_params.get('output', 'ndjson')
+        compress = request.query_params.get('compress') == 'gzip'
+        types = request.query_params.get('types')
+        record_types = types.split(',') if types else None
+        if output not in EXPORT_FORMATS or (
+            record_types and not set(record_types) <= set(EXPORT_RECORD_TYPES)
+        ):
+            return Response({
+                'error': 'Invalid export options',
+                'details': {
+                    'output': list(EXPORT_FORMATS),
+                    'types': list(EXPORT_RECORD_TYPES),
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = StreamingHttpResponse(
+            stream_tenant_export(tenant.pk, output, compress, record_types),
+            content_type='application/gzip' if compress else CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export_filename(tenant, output, compress)}"'
+        )
+        return response
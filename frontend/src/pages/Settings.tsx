@@ -267,7 +267,10 @@ const Settings: React.FC = () => {
                     sx={{ width: 100, height: 100, mb: 2, bgcolor: 'primary.main' }}
                   >
                     {user?.avatar ? (
-                      <img src={user.avatar} alt="Profile" />
+                      <img
+                        src={(user as any).avatar_thumbnails?.['128'] || user.avatar}
+                        alt="Profile"
+                      />
                     ) : (
                       getInitials(user?.first_name || '', user?.last_name || '')
                     )}
@@ -77,6 +77,7 @@ interface User {
   is_active: boolean;
   is_tenant_admin: boolean;
   avatar?: string;
+  avatar_thumbnails?: Record<string, string>;
   date_joined: string;
   last_login?: string;
   profile?: {
@@ -532,7 +533,10 @@ const Users: React.FC = () => {
                     >
                       <Avatar sx={{ mr: 2, bgcolor: 'primary.main' }}>
                         {user.avatar ? (
-                          <img src={user.avatar} alt={`${user.first_name} ${user.last_name}`} />
+                          <img
+                            src={user.avatar_thumbnails?.['64'] || user.avatar}
+                            alt={`${user.first_name} ${user.last_name}`}
+                          />
                         ) : (
                           getInitials(user.first_name, user.last_name)
                         )}